@@ -87,59 +87,45 @@ class DlgAddCategory(QDialog):
 
     def btn_finish_and_save_clicked(self):
         """ Save added categories into DB. """
-        try:  # Create my_songbook INSTANCE and load data from the db.
-            my_songbook: Songbook = Songbook()
-            current_categories: list = my_songbook.get_categories_from_db()
-        except DatabaseError:
-            QMessageBox.critical(
+        new_categories: list[str] = []  # list of adding categories to pass to the DB.
+        # Checking if the lw_adding_categiries is not empty.
+        total_categories = self.ui.lw_adding_categiries.count()
+        if total_categories == 0:
+            QMessageBox.warning(
                 self,
-                "Открытие базы данных",
-                "Ошибка при обращении к базе данных.")
-        else:
-            new_categories: list[str] = []  # list of adding categories to pass to the DB.
-            # Checking if the lw_adding_categiries is not empty.
-            total_categories = self.ui.lw_adding_categiries.count()
-            if total_categories == 0:
-                QMessageBox.warning(
+                "Добавление категории",
+                "Список добавляемых категорий пуст.\n"
+                "Добавьте хотя бы одину категорию.")
+            self.ui.le_category.setFocus()
+        else:  # not empty.
+            for idx in range(total_categories):
+                new_categories.append(
+                    self.ui.lw_adding_categiries.item(idx).text())
+            try:
+                # Create my_songbook INSTANCE and add the new categories:
+                # the existing ones (also in the different case such
+                # as Category_1 and category_1) are skipped by Songbook.
+                my_songbook: Songbook = Songbook()
+                added, existing = my_songbook.add_categories(new_categories)
+            except DatabaseError:
+                QMessageBox.critical(
                     self,
                     "Добавление категории",
-                    "Список добавляемых категорий пуст.\n"
-                    "Добавьте хотя бы одину категорию.")
-                self.ui.le_category.setFocus()
-            else:  # not empty.
-                for idx in range(total_categories):
-                    new_categories.append(
-                        self.ui.lw_adding_categiries.item(idx).text())
-                # to avoid duplicates of categories in the different case such
-                # as Category_1 and category_1.
-                is_category_exists: bool = False
-                checking_category: str = ""  # for QMessageBox
-                for new_category in new_categories:
-                    for current_category in current_categories:
-                        if new_category.lower() == current_category.lower():
-                            is_category_exists = True
-                            checking_category = new_category
-                            break
-                    if is_category_exists:
-                        break
-                if is_category_exists:
+                    "Ошибка при добавлении категории.")
+            else:
+                if not added:  # all of them are in DB.
                     QMessageBox.warning(
                         self,
                         "Добавление категории",
-                        f"Категория '{checking_category}' уже есть в базе данных.")
-                else:  # category not in DB
-                    try:
-                        my_songbook.insert_categories_into_db(new_categories)
-                    except DatabaseError:
-                        QMessageBox.critical(
-                            self,
-                            "Добавление категории",
-                            "Ошибка при добавлении категории.")
-                    else:
-                        QMessageBox.information(
-                            self,
-                            "Добавление категории",
-                            "Категории успешно добалены в песенник.")
-                        self.ui.lw_adding_categiries.clear()
-                        self.ui.le_category.clear()
-                        self.ui.le_category.setFocus()
+                        f"Категории уже есть в базе данных: {', '.join(existing)}.")
+                else:
+                    message: str = "Категории успешно добалены в песенник."
+                    if existing:
+                        message += f"\nУже есть в базе данных: {', '.join(existing)}."
+                    QMessageBox.information(
+                        self,
+                        "Добавление категории",
+                        message)
+                    self.ui.lw_adding_categiries.clear()
+                    self.ui.le_category.clear()
+                    self.ui.le_category.setFocus()
@@ -86,60 +86,45 @@ class DlgAddGenre(QDialog):
 
     def btn_finish_and_save_clicked(self):
         """ Save added genres into DB. """
-        try:
-            # Create my_songbook INSTANCE and load data from the db.
-            my_songbook: Songbook = Songbook()
-            current_genres: list = my_songbook.get_genres_from_db()
-        except DatabaseError:
-            QMessageBox.critical(
+        new_genres: list[str] = []  # list of adding genres to pass to the DB.
+        # Checking if the lw_adding_genres is not empty.
+        total_genres = self.ui.lw_adding_genres.count()
+        if total_genres == 0:
+            QMessageBox.warning(
                 self,
-                "Открытие базы данных",
-                "Ошибка при обращении к базе данных.")
-        else:
-            new_genres: list[str] = []  # list of adding genres to pass to the DB.
-            # Checking if the lw_adding_genres is not empty.
-            total_genres = self.ui.lw_adding_genres.count()
-            if total_genres == 0:
-                QMessageBox.warning(
+                "Добавление жанра",
+                "Список добавляемых жанров пуст.\n"
+                "Добавьте хотя бы один жанр.")
+            self.ui.le_genre.setFocus()
+        else:  # not empty.
+            for idx in range(total_genres):
+                new_genres.append(
+                    self.ui.lw_adding_genres.item(idx).text())
+            try:
+                # Create my_songbook INSTANCE and add the new genres:
+                # the existing ones (also in the different case such
+                # as Genre_1 and genre_1) are skipped by Songbook.
+                my_songbook: Songbook = Songbook()
+                added, existing = my_songbook.add_genres(new_genres)
+            except DatabaseError:
+                QMessageBox.critical(
                     self,
                     "Добавление жанра",
-                    "Список добавляемых жанров пуст.\n"
-                    "Добавьте хотя бы один жанр.")
-                self.ui.le_genre.setFocus()
-            else:  # not empty.
-                for idx in range(total_genres):
-                    new_genres.append(
-                        self.ui.lw_adding_genres.item(idx).text())
-                # to avoid duplicates of genres in the different case such
-                # as Genre_1 and genre_1.
-                is_genre_exists: bool = False
-                checking_genre: str = ""  # for QMessageBox
-                for new_genre in new_genres:
-                    for current_genre in current_genres:
-                        if new_genre.lower() == current_genre.lower():
-                            is_genre_exists = True
-                            checking_genre = new_genre
-                            break
-                    if is_genre_exists:
-                        break
-                if is_genre_exists:
+                    "Ошибка при добавлении жанра.")
+            else:
+                if not added:  # all of them are in DB.
                     QMessageBox.warning(
                         self,
                         "Добавление жанра",
-                        f"Жанр '{checking_genre}' уже есть в базе данных.")
-                else:  # category not in DB
-                    try:
-                        my_songbook.insert_genres_into_db(new_genres)
-                    except DatabaseError:
-                        QMessageBox.critical(
-                            self,
-                            "Добавление жанра",
-                            "Ошибка при добавлении жанра.")
-                    else:
-                        QMessageBox.information(
-                            self,
-                            "Добавление жанра",
-                            "Жанры успешно добалены в песенник.")
-                        self.ui.lw_adding_genres.clear()
-                        self.ui.le_genre.clear()
-                        self.ui.le_genre.setFocus()
+                        f"Жанры уже есть в базе данных: {', '.join(existing)}.")
+                else:
+                    message: str = "Жанры успешно добалены в песенник."
+                    if existing:
+                        message += f"\nУже есть в базе данных: {', '.join(existing)}."
+                    QMessageBox.information(
+                        self,
+                        "Добавление жанра",
+                        message)
+                    self.ui.lw_adding_genres.clear()
+                    self.ui.le_genre.clear()
+                    self.ui.le_genre.setFocus()
@@ -10,8 +10,15 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import Slot, QDate
 from PySide6.QtGui import QPixmap
 from my_classes.songbook import Songbook
+from my_classes.song import (
+    Song,
+    DATE_FORMAT,
+)
 from gui import dlg_add_songs_ui
 
+# le_song of a title which is already in DB.
+TITLE_EXISTS_STYLE: str = "QLineEdit { background-color: #ffd7d7; }"
+
 
 class DlgAddSong(QDialog):
     """ Class DlgAddSong. """
@@ -24,7 +31,7 @@ class DlgAddSong(QDialog):
         self.src_image_ext: str = ""
         self.path_to_images: str = f"{os.path.abspath(".")}{os.path.sep}images{os.path.sep}"
         # self.path_to_texts: str = f"{os.path.abspath(".")}{os.path.sep}texts{os.path.sep}"
-        self.new_song: dict = {}
+        self.new_song: Song | None = None
         self.title: str = ""
         self.genres: list[str] = []
         self.category: str = ""
@@ -47,6 +54,7 @@ class DlgAddSong(QDialog):
         self.ui.btn_choose_image_file.clicked.connect(
             self.btn_choose_image_file_clicked)
         self.ui.btn_cancel.clicked.connect(self.close)
+        self.ui.le_song.textChanged.connect(self.le_song_text_changed)
 
     def fill_in_genres(self):
         """ Get genres from DB and fill in lw_genres. """
@@ -94,6 +102,24 @@ class DlgAddSong(QDialog):
                     self.ui.cb_categories.addItem(category)
             self.ui.cb_categories.setCurrentIndex(-1)
 
+    @Slot(str)
+    def le_song_text_changed(self, text: str) -> None:
+        """ Mark le_song while typing if the song is already in DB. """
+        # the same title as it's saved.
+        title: str = text.strip().replace("'", '"')
+        is_song_exists: bool = False
+        if title != "":
+            try:  # ONE indexed row is probed, it's fast for any songbook.
+                is_song_exists = Songbook().title_exists(title)
+            except DatabaseError:
+                pass  # it's checked again when the song is saved.
+        if is_song_exists:
+            self.ui.le_song.setStyleSheet(TITLE_EXISTS_STYLE)
+            self.ui.le_song.setToolTip(f"Песня '{title}' уже есть в базе данных.")
+        else:
+            self.ui.le_song.setStyleSheet("")
+            self.ui.le_song.setToolTip("")
+
     @Slot()
     def btn_choose_image_file_clicked(self) -> None:
         """
@@ -159,20 +185,15 @@ class DlgAddSong(QDialog):
             try:
                 # Create my_songbook INSTANCE and load data from the db.
                 my_songbook: Songbook = Songbook()
-                current_titles: list = my_songbook.get_titles_from_db()
+                # to avoid duplicates of titles in the different case such
+                # as Song_1 and song_1 (by the UNIQUE index of titles).
+                is_song_exists: bool = my_songbook.title_exists(self.title)
             except DatabaseError:
                 QMessageBox.critical(
                     self,
                     "Открытие базы данных",
                     "Ошибка при обращении к базе данных.")
             else:
-                # to avoid duplicates of titles in the different case such
-                # as Song_1 and song_1.
-                is_song_exists: bool = False
-                for current_title in current_titles:
-                    if self.title.lower() == current_title.lower():
-                        is_song_exists = True
-                        break
                 if is_song_exists:
                     QMessageBox.warning(
                         self,
@@ -188,22 +209,23 @@ class DlgAddSong(QDialog):
                     self.song_image = self.save_image(self.title)
                     self.song_text = self.ui.te_song_text.toPlainText()
                     self.last_performed = self.ui.de_last_performed.date().toString(
-                        "dd.MM.yyyy")
+                        DATE_FORMAT)
                     # self.last_performed = self.ui.de_last_performed.date().toString(
                     #     "dd MMMM yyyy")
                     self.is_recently = 1 if self.ui.chb_last_performed.isChecked() else 0
                     self.comment = self.ui.te_comment.toPlainText()
 
-                    self.new_song = {
-                        "title": self.title,
-                        "genres": self.genres,
-                        "category": self.category,
-                        "song_image": self.song_image,
-                        "song_text": self.song_text,
-                        "last_performed": self.last_performed,
-                        "is_recently": self.is_recently,
-                        "comment": self.comment,
-                    }
+                    self.new_song = Song(
+                        id=None,
+                        title=self.title,
+                        genres=tuple(self.genres),
+                        category=self.category,
+                        song_image=self.song_image,
+                        song_text=self.song_text,
+                        last_performed=self.last_performed,
+                        is_recently=self.is_recently,
+                        comment=self.comment,
+                    )
                     try:
                         my_songbook.insert_song_into_db(self.new_song)
                     except DatabaseError:
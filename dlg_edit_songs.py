@@ -10,8 +10,16 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import Slot, QDate
 from PySide6.QtGui import QPixmap
 from my_classes.songbook import Songbook
+from my_classes.song import (
+    Song,
+    SongChanges,
+    DATE_FORMAT,
+)
 from gui import dlg_edit_songs_ui
 
+# le_song of a title which is already in DB.
+TITLE_EXISTS_STYLE: str = "QLineEdit { background-color: #ffd7d7; }"
+
 
 class DlgEditSong(QDialog):
     """ Class DlgEditSong. """
@@ -20,17 +28,16 @@ class DlgEditSong(QDialog):
         self.ui = dlg_edit_songs_ui.Ui_dlg_edit_songs()
         self.ui.setupUi(self)
 
-        # for updating song in the DB.
+        # for updating song in the DB (by its id).
         # for reason to get acces to its from all methods.
-        self._current_title: str = ""
-        self._current_song_dict: dict = {}
+        self._current_song: Song | None = None
 
         self.path_to_src_image: str = ""
         self.is_image_chosen: bool = False
 
         self.src_image_ext: str = ""
         self.path_to_images: str = f"{os.path.abspath(".")}{os.path.sep}images{os.path.sep}"
-        self.new_song: dict = {}
+        self.new_song: Song | None = None
         self.title: str = ""
         self.genres: list[str] = []
         self.category: str = ""
@@ -55,39 +62,43 @@ class DlgEditSong(QDialog):
         self.ui.btn_delete_image_file.clicked.connect(
             self.btn_delete_image_file_clicked)
         self.ui.btn_cancel.clicked.connect(self.close)
+        self.ui.le_song.textChanged.connect(self.le_song_text_changed)
 
-    @Slot(str)
-    def get_current_song(self, current_title):
+    @Slot(int)
+    def get_current_song(self, id_song):
         """
-        Slot to get current_title and fill in le_songs
+        Slot to get id of the current song and fill in le_songs
         from Signal edit_song_called in main.py.
         """
-        self._current_title = current_title
         try:
             my_songbook: Songbook = Songbook()  # Create Songbook INSTANCE.
-            self._current_song_dict = my_songbook.get_the_song_as_dict(current_title)
+            self._current_song = my_songbook.get_song(id_song)
         except DatabaseError:
             QMessageBox.critical(
                 self,
                 "Открытие базы данных", 
                 "Ошибка при чтении жанров из базы данных.")
         else:
+            if self._current_song is None:  # deleted by another program.
+                QMessageBox.warning(
+                    self,
+                    "Редактирование песни",
+                    "Песня не найдена в базе данных.")
+                return
             self.fill_in_genres()
             self.fill_in_categories()
-            self.ui.le_song.setText(self._current_title)
-            if self._current_song_dict[self._current_title]["is_recently"] == 1:
+            self.ui.le_song.setText(self._current_song.title)
+            if self._current_song.is_recently == 1:
                 self.ui.chb_last_performed.setChecked(True)
             else:
                 self.ui.chb_last_performed.setChecked(False)
             self.ui.de_last_performed.setDate(
                 QDate.fromString(
-                    self._current_song_dict[self._current_title]["last_performed"],
-                    "dd.MM.yyyy"))
-            self.ui.te_song_text.setText(
-                self._current_song_dict[self._current_title]["song_text"])
-            self.ui.te_comment.setText(
-                self._current_song_dict[self._current_title]["comment"])
-            self.song_image = self._current_song_dict[self._current_title]["song_image"]
+                    self._current_song.last_performed,
+                    DATE_FORMAT))
+            self.ui.te_song_text.setText(self._current_song.song_text)
+            self.ui.te_comment.setText(self._current_song.comment)
+            self.song_image = self._current_song.song_image
             if self.song_image != "":
                 self.ui.btn_delete_image_file.setEnabled(True)
                 self.ui.lbl_song_image.setPixmap(QPixmap(self.song_image))
@@ -95,6 +106,26 @@ class DlgEditSong(QDialog):
                 self.ui.btn_delete_image_file.setEnabled(False)
                 self.ui.lbl_song_image.setText("Нет картинки")
 
+    @Slot(str)
+    def le_song_text_changed(self, text: str) -> None:
+        """ Mark le_song while typing if the song is already in DB. """
+        # the same title as it's saved.
+        title: str = text.strip().replace("'", '"')
+        is_song_exists: bool = False
+        if title != "":
+            try:  # ONE indexed row is probed, it's fast for any songbook.
+                is_song_exists = Songbook().title_exists(
+                    title,
+                    self._current_song.id if self._current_song else None)
+            except DatabaseError:
+                pass  # it's checked again when the song is saved.
+        if is_song_exists:
+            self.ui.le_song.setStyleSheet(TITLE_EXISTS_STYLE)
+            self.ui.le_song.setToolTip(f"Песня '{title}' уже есть в базе данных.")
+        else:
+            self.ui.le_song.setStyleSheet("")
+            self.ui.le_song.setToolTip("")
+
     def fill_in_genres(self):
         """ Get genres from DB and fill in lw_genres. """
         try:
@@ -118,7 +149,7 @@ class DlgEditSong(QDialog):
                     self.ui.lw_genres.addItem(genre)
                 # set selected genres for current song in lw_genres.
                 for i in range(self.ui.lw_genres.count()):
-                    if self.ui.lw_genres.item(i).text() in self._current_song_dict[self._current_title]["genres"]:
+                    if self.ui.lw_genres.item(i).text() in self._current_song.genres:
                         self.ui.lw_genres.item(i).setSelected(True)
 
     def fill_in_categories(self):
@@ -143,7 +174,7 @@ class DlgEditSong(QDialog):
                 for category in categories:
                     self.ui.cb_categories.addItem(category)
                 # set category for current song in cb_categories.
-                self.ui.cb_categories.setCurrentText(self._current_song_dict[self._current_title]["category"])
+                self.ui.cb_categories.setCurrentText(self._current_song.category)
 
     @Slot()
     def btn_delete_image_file_clicked(self):
@@ -216,7 +247,7 @@ class DlgEditSong(QDialog):
 
             return path_to_dst_image
         # return the current path (not changed) to song_image
-        return self._current_song_dict[self._current_title]["song_image"]
+        return self._current_song.song_image
 
     @Slot()
     def btn_finish_and_save_clicked(self) -> None:
@@ -246,62 +277,81 @@ class DlgEditSong(QDialog):
             try:
                 # Create my_songbook INSTANCE and load data from the db.
                 my_songbook: Songbook = Songbook()
+                # another song may have the new title (in the different case).
+                is_song_exists: bool = my_songbook.title_exists(
+                    self.title, self._current_song.id)
             except DatabaseError:
                 QMessageBox.critical(
                     self,
                     "Открытие базы данных",
                     "Ошибка при обращении к базе данных.")
             else:
-                for item in self.ui.lw_genres.selectedItems():
-                    self.genres.append(item.text())
+                if is_song_exists:
+                    QMessageBox.warning(
+                        self,
+                        "Редактирование песни",
+                        f"Песня '{self.title}' уже есть в базе данных.")
+                    self.ui.le_song.setFocus()
+                else:
+                    # the dialog stays open after a save without changes.
+                    self.genres = []
+                    for item in self.ui.lw_genres.selectedItems():
+                        self.genres.append(item.text())
 
-                self.category = self.ui.cb_categories.currentText()
+                    self.category = self.ui.cb_categories.currentText()
 
-                if self.is_image_deleted:
-                    self.song_image = self.delete_image_permanently()
-                else:
-                    self.song_image = self.save_image_file(self.title)
+                    if self.is_image_deleted:
+                        self.song_image = self.delete_image_permanently()
+                    else:
+                        self.song_image = self.save_image_file(self.title)
 
-                self.song_text = self.ui.te_song_text.toPlainText()
-                self.last_performed = self.ui.de_last_performed.date().toString(
-                    "dd.MM.yyyy")
-                # self.last_performed = self.ui.de_last_performed.date().toString(
-                #     "dd MMMM yyyy")
-                self.is_recently = 1 if self.ui.chb_last_performed.isChecked() else 0
-                self.comment = self.ui.te_comment.toPlainText()
+                    self.song_text = self.ui.te_song_text.toPlainText()
+                    self.last_performed = self.ui.de_last_performed.date().toString(
+                        DATE_FORMAT)
+                    # self.last_performed = self.ui.de_last_performed.date().toString(
+                    #     "dd MMMM yyyy")
+                    self.is_recently = 1 if self.ui.chb_last_performed.isChecked() else 0
+                    self.comment = self.ui.te_comment.toPlainText()
 
-                self.new_song = {
-                    "title": self.title,
-                    "genres": self.genres,
-                    "category": self.category,
-                    "song_image": self.song_image,
-                    "song_text": self.song_text,
-                    "last_performed": self.last_performed,
-                    "is_recently": self.is_recently,
-                    "comment": self.comment,
-                }
-                try:
-                    my_songbook.update_song(
-                                    self._current_title,
-                                    self.new_song)
-                except DatabaseError as e:
-                    QMessageBox.critical(
-                        self,
-                        "Редактирование песни",
-                        f"Ошибка при редактировании песни.{e}")
-                else:
-                    QMessageBox.information(
-                        self,
-                        "Редактирование песни",
-                        "Песня успешно отредактирована.")
-                    self.ui.lw_genres.setCurrentRow(-1)
-                    self.ui.cb_categories.setCurrentIndex(-1)
-                    self.ui.chb_last_performed.setChecked(False)
-                    self.ui.te_song_text.clear()
-                    self.ui.te_comment.clear()
-                    self.ui.lbl_song_image.clear()
-                    self.ui.le_song.clear()
-                    self.ui.le_song.setFocus()
-                    # for save_image method to check if an image is chosen.
-                    self.path_to_src_image = ""
-                    self.close()
+                    self.new_song = Song(
+                        id=self._current_song.id,
+                        title=self.title,
+                        genres=tuple(self.genres),
+                        category=self.category,
+                        song_image=self.song_image,
+                        song_text=self.song_text,
+                        last_performed=self.last_performed,
+                        is_recently=self.is_recently,
+                        comment=self.comment,
+                    )
+                    try:
+                        changes: SongChanges = my_songbook.update_song_by_id(
+                                        self._current_song.id,
+                                        self.new_song)
+                    except DatabaseError as e:
+                        QMessageBox.critical(
+                            self,
+                            "Редактирование песни",
+                            f"Ошибка при редактировании песни.{e}")
+                    else:
+                        if not changes:  # nothing is changed, DB isn't written.
+                            QMessageBox.information(
+                                self,
+                                "Редактирование песни",
+                                "Песня не изменилась.")
+                        else:
+                            QMessageBox.information(
+                                self,
+                                "Редактирование песни",
+                                "Песня успешно отредактирована.")
+                            self.ui.lw_genres.setCurrentRow(-1)
+                            self.ui.cb_categories.setCurrentIndex(-1)
+                            self.ui.chb_last_performed.setChecked(False)
+                            self.ui.te_song_text.clear()
+                            self.ui.te_comment.clear()
+                            self.ui.lbl_song_image.clear()
+                            self.ui.le_song.clear()
+                            self.ui.le_song.setFocus()
+                            # for save_image method to check if an image is chosen.
+                            self.path_to_src_image = ""
+                            self.close()
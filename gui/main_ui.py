@@ -17,9 +17,10 @@ from PySide6.QtGui import (QAction, QBrush, QColor, QConicalGradient,
     QPainter, QPalette, QPixmap, QRadialGradient,
     QTransform)
 from PySide6.QtWidgets import (QAbstractItemView, QApplication, QFrame, QLabel,
-    QLineEdit, QListWidget, QListWidgetItem, QMainWindow,
-    QMenu, QMenuBar, QSizePolicy, QSplitter,
-    QStatusBar, QTextEdit, QVBoxLayout, QWidget)
+    QLineEdit, QListView, QListWidget, QListWidgetItem,
+    QMainWindow, QMenu, QMenuBar, QSizePolicy,
+    QSplitter, QStatusBar, QTextEdit, QVBoxLayout,
+    QWidget)
 import res_rc
 
 class Ui_MainWindow(object):
@@ -158,13 +159,14 @@ class Ui_MainWindow(object):
         self.spl_songs = QSplitter(self.splitter)
         self.spl_songs.setObjectName(u"spl_songs")
         self.spl_songs.setOrientation(Qt.Orientation.Horizontal)
-        self.lw_songs = QListWidget(self.spl_songs)
-        self.lw_songs.setObjectName(u"lw_songs")
-        self.lw_songs.setFont(font)
-        self.lw_songs.setAlternatingRowColors(True)
-        self.lw_songs.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
-        self.lw_songs.setSelectionRectVisible(True)
-        self.spl_songs.addWidget(self.lw_songs)
+        self.lv_songs = QListView(self.spl_songs)
+        self.lv_songs.setObjectName(u"lv_songs")
+        self.lv_songs.setFont(font)
+        self.lv_songs.setAlternatingRowColors(True)
+        self.lv_songs.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.lv_songs.setUniformItemSizes(True)
+        self.lv_songs.setSelectionRectVisible(True)
+        self.spl_songs.addWidget(self.lv_songs)
         self.lbl_song_image = QLabel(self.spl_songs)
         self.lbl_song_image.setObjectName(u"lbl_song_image")
         self.lbl_song_image.setFont(font1)
@@ -224,9 +226,6 @@ class Ui_MainWindow(object):
 
         self.retranslateUi(MainWindow)
 
-        self.lw_songs.setCurrentRow(-1)
-
-
         QMetaObject.connectSlotsByName(MainWindow)
     # setupUi
 
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 """ Main window """
 import os
+from collections.abc import Callable
 from sqlite3 import DatabaseError
 from PySide6.QtWidgets import (
     QMainWindow,
@@ -12,12 +13,13 @@ from PySide6.QtWidgets import (
     QHBoxLayout,
     QLabel,
     QPushButton,
-    QListWidgetItem,
 )
 from PySide6.QtCore import (
-    Qt,
     Signal,
     Slot,
+    QTimer,
+    QModelIndex,
+    QItemSelectionModel,
 )
 from PySide6.QtGui import (
     QFont,
@@ -33,6 +35,38 @@ from dlg_add_songs import DlgAddSong
 from dlg_edit_songs import DlgEditSong
 from dlg_about import DlgAbout
 from my_classes.songbook import Songbook
+from my_classes.song import (
+    Song,
+    SongChanges,
+    SongCollection,
+    format_date,
+    nocase_key,
+    title_key,
+)
+from my_classes.song_list_model import (
+    SongListModel,
+    ID_ROLE,
+    SONG_ROLE,
+)
+from my_classes.song_item_delegate import SongItemDelegate
+from my_classes.songbook_worker import (
+    SongbookTask,
+    SongbookWorker,
+)
+
+# All songs are shown by pages of this size while the list is scrolled.
+SONGS_PAGE_SIZE: int = 100
+# How many rows above and below the current one get their song texts
+# prefetched (to scroll the list by arrows without DB requests).
+PREFETCH_ROWS: int = 2
+# The full-text search in the texts and comments (Songbook.search) is done
+# for queries from this length, it shows up to this limit of songs.
+FULL_TEXT_SEARCH_MIN_LENGTH: int = 2
+FULL_TEXT_SEARCH_LIMIT: int = 200
+# The search starts when the user stops typing for this time (ms).
+SEARCH_DELAY: int = 250
+# How often (ms) to check if DB is changed by another program.
+CHANGES_CHECK_INTERVAL: int = 2000
 
 
 class MainWindow(QMainWindow):
@@ -41,7 +75,7 @@ class MainWindow(QMainWindow):
     # to pass current (category, genre).
     edit_category_called = Signal(str)
     edit_genre_called = Signal(str)
-    edit_song_called = Signal(str)
+    edit_song_called = Signal(int)
 
     # # my SIGNALs when lblZoomIn and lblZoomOut clicked.
     # lblZoomInClicked = QtCore.pyqtSignal()
@@ -55,11 +89,40 @@ class MainWindow(QMainWindow):
         self.path_to_images: str = f"{os.path.abspath(".")}{os.path.sep}images{os.path.sep}"
         # self.path_to_texts: str = f"{os.path.abspath(".")}{os.path.sep}texts{os.path.sep}"
 
-        # to get access to Songbook's dict
-        # and not to create an instance of Songbook 
-        # every click on lw_songs_item_clicked.
-        self.songs_dict: dict = {}
+        # to get access to Songbook's songs
+        # and not to load them from DB
+        # every click on lv_songs_item_clicked.
+        self.songs: SongCollection = SongCollection()
+        # the shown songs (all songs or search results) for lv_songs.
+        self.song_model: SongListModel = SongListModel(self)
+        self.ui.lv_songs.setModel(self.song_model)
+        # paints the rows from the Song records.
+        self.ui.lv_songs.setItemDelegate(SongItemDelegate(self.ui.lv_songs))
+        # the previous query and the songs found in their titles, dates,
+        # categories and genres (a longer query only filters them).
+        self.last_query: str = ""
+        self.found_songs: list[Song] = []
+        # don't search on every keystroke.
+        self.search_timer: QTimer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DELAY)
+        # seq of the last change of DB which is shown (see pull_changes)
+        # and PRAGMA data_version to notice the changes of other programs.
+        self.change_seq: int = 0
+        self.data_version: int = 0
+        self.changes_timer: QTimer = QTimer(self)
+        self.changes_timer.setInterval(CHANGES_CHECK_INTERVAL)
         self.title: str = ""
+        # one long-lived Songbook INSTANCE keeps the shared DB connection
+        # open while the window lives (dialogs reuse it via ConnectionPool).
+        self.my_songbook: Songbook = Songbook()
+        # the long requests (loading all songs, deleting) run in the
+        # background thread, their results are shown when they come.
+        self.worker: SongbookWorker = SongbookWorker()
+        # the running load of all songs (see show_songs).
+        self.load_task: SongbookTask | None = None
+        # {task: function to call with its result} of the other requests.
+        self.worker_tasks: dict[SongbookTask, Callable[[object], None]] = {}
 
         self.font_size = 14
         self.font_family = self.ui.lw_genres.font().family()  # Lucida Console
@@ -78,6 +141,7 @@ class MainWindow(QMainWindow):
         self.fill_in_genres()
         self.fill_in_categories()
         self.show_songs()
+        self.changes_timer.start()
 
     def do_connections(self) -> None:
         """ Do connections. """
@@ -97,16 +161,24 @@ class MainWindow(QMainWindow):
             self.act_edit_genre_triggered)
         self.ui.act_edit_song.triggered.connect(
             self.act_edit_song_triggered)
-        self.ui.lw_songs.currentRowChanged.connect(
-            self.lw_songs_currentrow_changed)
-        self.ui.lw_songs.itemSelectionChanged.connect(
-            self.lw_songs_itemselection_changed)
+        self.ui.lv_songs.selectionModel().currentRowChanged.connect(
+            self.lv_songs_currentrow_changed)
+        self.ui.lv_songs.selectionModel().selectionChanged.connect(
+            self.lv_songs_selection_changed)
         self.ui.le_search.textChanged.connect(
             self.le_search_text_changed)
+        self.search_timer.timeout.connect(self.search_songs)
+        self.changes_timer.timeout.connect(self.changes_timer_timeout)
         self.ui.act_abput_program.triggered.connect(
             self.act_about_program_triggered)
         self.ui.act_about_qt.triggered.connect(lambda: QMessageBox.aboutQt(self))
 
+    def closeEvent(self, event) -> None:
+        """ Close the DB connections when the window is closed. """
+        self.worker.close()  # the running requests are cancelled.
+        self.my_songbook.close()
+        super().closeEvent(event)
+
     def create_statusbar(self) -> None:
         """ Creates statusbar and components for its. """
         self.stbar = self.ui.statusbar
@@ -134,7 +206,7 @@ class MainWindow(QMainWindow):
     def fill_in_categories(self) -> None:
         """ Fill in lw_categories from DB. """
         try:
-            my_songbook: Songbook = Songbook()  # Create Songbook INSTANCE.
+            my_songbook: Songbook = self.my_songbook
             categories: list = my_songbook.get_categories_from_db()
         except DatabaseError:
             QMessageBox.critical(
@@ -156,7 +228,7 @@ class MainWindow(QMainWindow):
     def fill_in_genres(self) -> None:
         """ Fill in lw_genres from DB. """
         try:
-            my_songbook: Songbook = Songbook()
+            my_songbook: Songbook = self.my_songbook
             genres: list = my_songbook.get_genres_from_db()
         except DatabaseError:
             QMessageBox.critical(
@@ -174,102 +246,296 @@ class MainWindow(QMainWindow):
                 for genre in genres:
                     self.ui.lw_genres.addItem(genre)
 
-    def get_current_song_title(self, row_text: str) -> str:
-        """ Get current song's title. """
-        # get current song's title.
-        i = row_text.find(":\n")  # SongName:\n
-        return row_text[:i]
-
     @Slot()
-    def lw_songs_currentrow_changed(self) -> None:
+    def lv_songs_currentrow_changed(self) -> None:
         """ Change te_song_text widget text when the item clicked. """
         # get current song's title.
-        if self.ui.lw_songs.currentRow() != -1:  # avoid empty self.title (= "").
-            self.title = self.get_current_song_title(
-                                    self.ui.lw_songs.currentItem().text())
+        current: QModelIndex = self.ui.lv_songs.currentIndex()
+        row: int = current.row()
+        if row != -1:  # avoid empty self.title (= "").
+            song: Song = current.data(SONG_ROLE)
+            self.title = song.title
 
             # fill in te_song_text and lbl_song_image.
-            self.ui.te_song_text.setPlainText(
-                self.songs_dict[self.title]["song_text"])
+            try:
+                # the song texts are loaded on demand.
+                self.ui.te_song_text.setPlainText(
+                    self.my_songbook.get_song_text(song.id))
+                self.my_songbook.prefetch_song_texts([
+                    neighbour.id for neighbour in self.song_model.songs()[
+                        max(row - PREFETCH_ROWS, 0):row + PREFETCH_ROWS + 1]])
+            except DatabaseError:
+                QMessageBox.critical(
+                    self,
+                    "Открытие базы данных",
+                    "Ошибка при чтении текста песни из базы данных.")
 
-            song_image: str = self.songs_dict[self.title]["song_image"]
+            song_image: str = song.song_image
             if song_image == "":
                 self.ui.lbl_song_image.setText("Нет картинки")
             else:
                 self.ui.lbl_song_image.setPixmap(QPixmap(song_image))
 
     @Slot()
-    def lw_songs_itemselection_changed(self) -> None:
-        """ Shows quantity of selection songs in the lw_songs. """
-        self.selected_records = len(self.ui.lw_songs.selectedItems())
+    def lv_songs_selection_changed(self) -> None:
+        """ Shows quantity of selection songs in the lv_songs. """
+        self.selected_records = len(
+            self.ui.lv_songs.selectionModel().selectedRows())
         self.lbl_selected_records.setText(
             f"{self.str_selected_records}{str(self.selected_records)}")
 
     def show_songs(self) -> None:
-        """ Show all songs records. """
+        """
+        Show all songs records page by page (see fetch_songs_page),
+        so the first rows are shown at once whatever the number of songs.
+        Meanwhile the worker thread loads all of them for searching
+        (see songs_batch_loaded).
+        """
+        if self.load_task is not None:  # load them from the beginning.
+            self.load_task.cancel()
+            self.load_task = None
         try:
-            # Create Songbook INSTANCE and load data from the db.
-            my_songbook: Songbook = Songbook()
-            my_songbook_dict: dict = my_songbook.get_data_as_dict()
-            # to get access to Songbook's dict
-            # and not to create an instance of Songbook 
-            # every click on lw_songs_item_clicked.
-            self.songs_dict = my_songbook_dict
+            # the songs could be changed by the dialogs.
+            self.my_songbook.clear_text_cache()
+            # the changes done while loading are pulled again later.
+            self.data_version = self.my_songbook.data_version()
         except DatabaseError:
             QMessageBox.critical(
                 self,
                 "Открытие базы данных", 
                 "Ошибка при обращении к базе данных.")
-        else:
-            self.total_records = len(my_songbook_dict)
-            self.lbl_total_records.setText(
-                f"{self.str_total_records}{str(self.total_records)}")
-            self.found_records = 0
-            self.lbl_found_records.setText(
-                f"{self.str_found_records}{str(self.found_records)}")
-            # check if the my_songbook.songbook is empty.
-            if len(my_songbook_dict) == 0:
-                QMessageBox.warning(
-                    self,
-                    "Показать все песни",
-                    "Ваш песенник пуст.\n"
-                    "Выберите 'Добавить песню' в главном окне.")
-            else:
-                self.ui.lw_songs.clear()
-                output_str: str = ""
-                for key in sorted(my_songbook_dict):
-                    desc_str: str = ""
-                    output_str = str(key) + ":\n"
-                    genres_str: str = ", ".join(my_songbook_dict[key]["genres"])
-                    desc_str = " " * (len(output_str) - 1) + genres_str + "\n"
-                    desc_str += " " * (len(output_str) - 1) + my_songbook_dict[key]["category"] + "\n"
-                    desc_str += " " * (len(output_str) - 1) + my_songbook_dict[key]["last_performed"] + "\n"
-                    desc_str += " " * (len(output_str) - 1) + my_songbook_dict[key]["comment"]
-                    output_str += desc_str  # [:-1]  # Delete last "\n"
-                    current_item: QListWidgetItem = QListWidgetItem(output_str)
-                    current_item.setFlags(current_item.flags() & ~Qt.ItemIsUserCheckable)
-                    self.ui.lw_songs.addItem(current_item)
-                    if my_songbook_dict[key]["is_recently"] == 1:
-                        current_item.setCheckState(Qt.CheckState.Checked)
-                        current_item.setForeground(Qt.red)
-                    else:
-                        current_item.setCheckState(Qt.CheckState.Unchecked)
-                        current_item.setForeground(Qt.black)
-        self.ui.lw_songs.setCurrentRow(0)  # 
+            return
+        # to get access to Songbook's songs
+        # and not to load them from DB
+        # every click on lv_songs_item_clicked.
+        self.songs = SongCollection()
+        self.last_query = ""
+        self.found_songs = []
+        self.total_records = 0
+        self.lbl_total_records.setText(
+            f"{self.str_total_records}{str(self.total_records)}")
+        self.found_records = 0
+        self.lbl_found_records.setText(
+            f"{self.str_found_records}{str(self.found_records)}")
+
+        self.load_task = self.worker.load_songs()
+        self.load_task.batch_loaded.connect(self.songs_batch_loaded)
+        self.load_task.progress.connect(self.songs_load_progress)
+        self.load_task.finished.connect(self.songs_loaded)
+        self.load_task.failed.connect(self.songs_load_failed)
+        self.load_task.start()
+        # the rows are produced by song_model when they're shown
+        # (from DB while the songs are loading).
+        self.song_model.show_pages(self.fetch_songs_page)
+        self.ui.lv_songs.setCurrentIndex(self.song_model.index(0))
+
+    def fetch_songs_page(self, after: Song | None) -> list[Song]:
+        """ Get the page of all songs after the last shown one for song_model. """
+        after_title: str | None = after.title if after is not None else None
+        if self.load_task is None:  # all songs are in memory.
+            return self.songs.page(after_title, SONGS_PAGE_SIZE)
+        try:
+            # by the title index, as fast for the last page as for the first.
+            return self.my_songbook.get_songs_page(after_title, SONGS_PAGE_SIZE)
+        except DatabaseError:
+            QMessageBox.critical(
+                self,
+                "Открытие базы данных",
+                "Ошибка при обращении к базе данных.")
+            return []
+
+    @Slot(list)
+    def songs_batch_loaded(self, songs: list[Song]) -> None:
+        """ Add the next loaded songs (ordered by title) to self.songs. """
+        if self.sender() is not self.load_task:  # of a cancelled load.
+            return
+        for song in songs:
+            self.songs.append(song)
+        self.total_records = len(self.songs)
+        self.lbl_total_records.setText(
+            f"{self.str_total_records}{str(self.total_records)}")
+
+    @Slot(int, int)
+    def songs_load_progress(self, done: int, total: int) -> None:
+        """ Show how many songs are loaded. """
+        if self.sender() is self.load_task:
+            self.stbar.showMessage(f" Загрузка песен: {done} из {total}")
+
+    @Slot(object)
+    def songs_loaded(self, change_seq: int) -> None:
+        """ All songs are loaded: pull the changes done while loading. """
+        if self.sender() is not self.load_task:
+            return
+        self.load_task = None
+        self.change_seq = change_seq
+        self.stbar.clearMessage()
+        # check if the songs are empty.
+        if len(self.songs) == 0:
+            QMessageBox.warning(
+                self,
+                "Показать все песни",
+                "Ваш песенник пуст.\n"
+                "Выберите 'Добавить песню' в главном окне.")
+        elif self.ui.le_search.text().strip() != "":
+            # search in all songs, not in the loaded part of them.
+            self.last_query = ""
+            self.search_songs()
+        self.pull_changes()
+
+    @Slot(str)
+    def songs_load_failed(self, message: str) -> None:
+        """ Loading of the songs is failed. """
+        if self.sender() is not self.load_task:
+            return
+        self.load_task = None
+        self.stbar.clearMessage()
+        QMessageBox.critical(
+            self,
+            "Открытие базы данных", 
+            "Ошибка при обращении к базе данных.")
+
+    def run_in_worker(self, task: SongbookTask,
+                      on_finished: Callable[[object], None]) -> None:
+        """
+        Start the task of the worker thread and keep it until it's done:
+        on_finished(its result) is called, an error is shown.
+        """
+        self.worker_tasks[task] = on_finished
+        task.finished.connect(self.worker_task_finished)
+        task.failed.connect(self.worker_task_failed)
+        task.start()
+
+    @Slot(object)
+    def worker_task_finished(self, result: object) -> None:
+        """ Call on_finished of the done task (see run_in_worker). """
+        on_finished = self.worker_tasks.pop(self.sender(), None)
+        if on_finished is not None:
+            on_finished(result)
+
+    @Slot(str)
+    def worker_task_failed(self, message: str) -> None:
+        """ The task (see run_in_worker) is failed. """
+        self.worker_tasks.pop(self.sender(), None)
+        QMessageBox.critical(
+            self,
+            "Открытие базы данных",
+            "Ошибка при обращении к базе данных.")
+
+    def show_changes_done(self, title: str, message: str) -> None:
+        """ Tell about the done change of DB and show it. """
+        QMessageBox.information(self, title, message)
+        self.pull_changes()
+
+    @Slot()
+    def changes_timer_timeout(self) -> None:
+        """ Pull the changes if DB is changed by another program. """
+        try:
+            data_version: int = self.my_songbook.data_version()
+        except DatabaseError:
+            return  # check it next time.
+        if data_version != self.data_version:
+            self.data_version = data_version
+            self.pull_changes()
+
+    def pull_changes(self) -> None:
+        """
+        Show the changes of DB done after self.change_seq (by this program
+        or by another one) instead of loading all data again.
+        """
+        if self.load_task is not None:  # pulled when all songs are loaded.
+            return
+        try:
+            pulled: tuple | None = self.my_songbook.changes_since(self.change_seq)
+        except DatabaseError:
+            QMessageBox.critical(
+                self,
+                "Открытие базы данных",
+                "Ошибка при обращении к базе данных.")
+            return
+        if pulled is None:  # too old, the log is pruned.
+            self.fill_in_genres()
+            self.fill_in_categories()
+            self.show_songs()
+            return
+        self.change_seq, changes, entities = pulled
+        if "genre" in entities:
+            self.fill_in_genres()
+        if "category" in entities:
+            self.fill_in_categories()
+        self.apply_changes(changes)
+
+    def apply_changes(self, changes: SongChanges) -> None:
+        """
+        Update only the changed songs (reported by Songbook) in self.songs
+        and in lv_songs: the rest rows, the selection and the scroll
+        position stay.
+        """
+        if not changes:
+            return
+        ids_changed: set[int] = changes.inserted | changes.updated
+        try:
+            changed_songs: list[Song] = self.my_songbook.get_songs_by_ids(ids_changed)
+        except DatabaseError:
+            QMessageBox.critical(
+                self,
+                "Открытие базы данных",
+                "Ошибка при обращении к базе данных.")
+            return
+        # the songs could be changed by the dialogs.
+        self.my_songbook.clear_text_cache(ids_changed | changes.deleted)
+        selection_model = self.ui.lv_songs.selectionModel()
+        current: QModelIndex = self.ui.lv_songs.currentIndex()
+        id_current: int | None = current.data(ID_ROLE) if current.isValid() else None
+        ids_selected: set[int] = {
+            index.data(ID_ROLE) for index in selection_model.selectedRows()}
+        # a song without genres is not shown (as it's not got by get_songs).
+        ids_removed: set[int] = changes.deleted | (
+            ids_changed - {song.id for song in changed_songs})
+        # the rows of the renamed songs are moved to their new places.
+        for song in changed_songs:
+            old_song: Song | None = self.songs.by_id(song.id)
+            if (old_song is not None and
+                    nocase_key(old_song.title) != nocase_key(song.title)):
+                ids_removed.add(song.id)
+        self.song_model.remove_songs(ids_removed)
+        self.songs.apply(ids_removed | ids_changed, changed_songs)
+        # show all songs or search in them again.
+        self.last_query = ""
+        self.search_songs()
+
+        self.total_records = len(self.songs)
+        self.lbl_total_records.setText(
+            f"{self.str_total_records}{str(self.total_records)}")
+        # the moved rows are new ones, select them again.
+        for id_song in ids_selected & ids_removed:
+            row: int = self.song_model.row_of(id_song)
+            if row != -1:
+                selection_model.select(
+                    self.song_model.index(row),
+                    QItemSelectionModel.SelectionFlag.Select)
+        row = self.song_model.row_of(id_current) if id_current is not None else -1
+        if row != -1 and row != self.ui.lv_songs.currentIndex().row():
+            # the current song is moved.
+            selection_model.setCurrentIndex(
+                self.song_model.index(row),
+                QItemSelectionModel.SelectionFlag.NoUpdate)
+            self.ui.lv_songs.scrollTo(self.song_model.index(row))
+        elif row != -1 and id_current in ids_changed:
+            self.lv_songs_currentrow_changed()  # show its new text and image.
 
     @Slot()
     def act_add_category_triggered(self) -> None:
         """  Create the instance of DlgAddCategory Class and show it. """
         dlg_add_category: DlgAddCategory = DlgAddCategory()
         dlg_add_category.exec()
-        self.fill_in_categories()
+        self.pull_changes()
 
     @Slot()
     def act_add_genre_triggered(self) -> None:
         """  Create the instance of DlgAddGenre Class and show it. """
         dlg_add_genre: DlgAddGenre = DlgAddGenre()
         dlg_add_genre.exec()
-        self.fill_in_genres()
+        self.pull_changes()
 
     @Slot()
     def act_add_song_triggered(self) -> None:
@@ -279,9 +545,7 @@ class MainWindow(QMainWindow):
 # dlg_add_song.setModal(True)
 # dlg_add_song.showMaximized()
         dlg_add_song.exec()
-        self.fill_in_categories()
-        self.fill_in_genres()
-        self.show_songs()
+        self.pull_changes()
 
     @Slot()
     def act_delete_category_triggered(self) -> None:
@@ -312,23 +576,13 @@ class MainWindow(QMainWindow):
                     categories.append(
                         self.ui.lw_genres.takeItem(
                             self.ui.lw_genres.row(item)).text())
-                try:
-                    # Create Songbook INSTANCE and load data from the db.
-                    my_songbook: Songbook = Songbook()
-                    my_songbook.delete_categories_from_db(categories)
-                except DatabaseError:
-                    QMessageBox.critical(
-                        self,
-                        "Открытие базы данных", 
-                        "Ошибка при обращении к базе данных.")
-                else:
-                    QMessageBox.information(
-                        self,
+                # the songs of the categories are deleted too,
+                # it may be long, so it's done by the worker thread.
+                self.run_in_worker(
+                    self.worker.call("delete_categories_from_db", categories),
+                    lambda changes: self.show_changes_done(
                         "Удаление категории(ий)",
-                        "Категории успешно удалены из песенника.")
-
-                    self.fill_in_categories()
-                    self.show_songs()
+                        "Категории успешно удалены из песенника."))
 
     @Slot()
     def act_delete_genre_triggered(self) -> None:
@@ -359,36 +613,23 @@ class MainWindow(QMainWindow):
                     genres.append(
                         self.ui.lw_genres.takeItem(
                             self.ui.lw_genres.row(item)).text())
-                try:
-                    # Create Songbook INSTANCE and load data from the db.
-                    my_songbook: Songbook = Songbook()
-                    my_songbook.delete_genres_from_db(genres)
-                except DatabaseError:
-                    QMessageBox.critical(
-                        self,
-                        "Открытие базы данных", 
-                        "Ошибка при обращении к базе данных.")
-                else:
-                    QMessageBox.information(
-                        self,
+                self.run_in_worker(
+                    self.worker.call("delete_genres_from_db", genres),
+                    lambda changes: self.show_changes_done(
                         "Удаление жанра(ов)",
-                        "Жанры успешно удалены из песенника.")
-
-                    self.fill_in_genres()
-                    self.show_songs()
+                        "Жанры успешно удалены из песенника."))
 
 
     @Slot()
     def act_delete_song_triggered(self) -> None:
         """ Delete song(s). """
-        total_songs = self.ui.lw_songs.count()
-        titles: list = []
+        total_songs = self.song_model.rowCount()
         if total_songs == 0:  # lw_categories is empty.
             QMessageBox.warning(
                 self,
                 "Удаление песен",
                 "Нечего удалять.\nСписок песен пуст.")
-        elif self.ui.lw_songs.currentRow() == -1:  #  or no selection.
+        elif self.ui.lv_songs.currentIndex().row() == -1:  #  or no selection.
             QMessageBox.warning(
                 self,
                 "Удаление песен",
@@ -402,29 +643,23 @@ class MainWindow(QMainWindow):
                 QMessageBox.Yes | QMessageBox.No,
                 QMessageBox.No)
             if btn_reply == QMessageBox.Yes:
-                for item in self.ui.lw_songs.selectedItems():
-                    title: str = self.get_current_song_title(item.text())
-                    titles.append(title)
-                try:
-                    # Create Songbook INSTANCE and load data from the db.
-                    my_songbook: Songbook = Songbook()
-                    my_songbook.delete_songs_from_db(titles)
-                    for title in titles:
-                        path_to_image: str = self.songs_dict[title]["song_image"]
-                        if path_to_image != "":
-                            self.delete_image_file(path_to_image)
-                except DatabaseError:
-                    QMessageBox.critical(
-                        self,
-                        "Открытие базы данных",
-                        "Ошибка при обращении к базе данных.")
-                else:
-                    QMessageBox.information(
-                        self,
-                        "Удаление песен",
-                        "Песни успешно удалены из песенника.")
-
-                    self.show_songs()
+                songs: list[Song] = [
+                    index.data(SONG_ROLE)
+                    for index in self.ui.lv_songs.selectionModel().selectedRows()]
+                self.run_in_worker(
+                    self.worker.call(
+                        "delete_songs_by_ids", [song.id for song in songs]),
+                    lambda changes: self.songs_deleted(songs))
+
+    def songs_deleted(self, songs: list[Song]) -> None:
+        """ Delete the image files of the deleted songs and show the changes. """
+        for song in songs:
+            path_to_image: str = song.song_image
+            if path_to_image != "":
+                self.delete_image_file(path_to_image)
+        self.show_changes_done(
+            "Удаление песен",
+            "Песни успешно удалены из песенника.")
 
     def delete_image_file(self, path_to_image: str) -> None:
         """
@@ -475,8 +710,7 @@ class MainWindow(QMainWindow):
                     self.ui.lw_categories.currentItem().text())
                 dlg_edit_category.exec()
                 # update categories and songs in the MainWindow.
-                self.fill_in_categories()
-                self.show_songs()
+                self.pull_changes()
 
     @Slot()
     def act_edit_genre_triggered(self) -> None:
@@ -513,95 +747,145 @@ class MainWindow(QMainWindow):
                     self.ui.lw_genres.currentItem().text())
                 dlg_edit_genre.exec()
                 # update genres and songs in the MainWindow.
-                self.fill_in_genres()
-                self.show_songs()
+                self.pull_changes()
 
     @Slot()
     def act_edit_song_triggered(self) -> None:
         """  Edit selected song. """
-        # check if there is multiselection in the lw_songs
-        if len(self.ui.lw_songs.selectedItems()) > 1:
+        # check if there is multiselection in the lv_songs
+        if len(self.ui.lv_songs.selectionModel().selectedRows()) > 1:
             QMessageBox.warning(
                 self,
                 "Редактирование песни",
                 "Вы не можете редактировать несколько песен одновременно.\n"
                 "Выберите одну песню.")
         else:
-            total_songs = self.ui.lw_songs.count()
-            if total_songs == 0:  # lw_songs is empty.
+            total_songs = self.song_model.rowCount()
+            if total_songs == 0:  # lv_songs is empty.
                 QMessageBox.warning(
                     self,
                     "Редактирование песни",
                     "Нечего редактировать\n"
                     "Список песен пуст.")
-            elif self.ui.lw_songs.currentRow() == -1:  # or no selection.
+            elif self.ui.lv_songs.currentIndex().row() == -1:  # or no selection.
                 QMessageBox.warning(
                     self,
                     "Редактирование песни",
                     "Нечего редактировать.\n"
                     "Для редактирования выберите песню в списке.")
-                self.ui.lw_songs.setFocus()
+                self.ui.lv_songs.setFocus()
             else:  # is selected.
                 # create instance of DlgEditSong.
                 dlg_edit_song: DlgEditSong = DlgEditSong()
                 # connect edit_song_called (my SIGNAL).
                 self.edit_song_called.connect(dlg_edit_song.get_current_song)
-                # emit SIGNAL edit_song_called (pass: current song as dict).
-                self.edit_song_called.emit(self.title)
+                # emit SIGNAL edit_song_called (pass: id of current song).
+                self.edit_song_called.emit(
+                    self.ui.lv_songs.currentIndex().data(ID_ROLE))
 # BUG: check showMaximized on other OS
 # dlg_add_song.setModal(True)
 # dlg_add_song.showMaximized()
                 dlg_edit_song.exec()
-                self.fill_in_categories()
-                self.fill_in_genres()
-                self.show_songs()
+                self.pull_changes()
 
     @Slot(str)
-    def le_search_text_changed(self, searching_text:str) -> None:
+    def le_search_text_changed(self, searching_text: str) -> None:
+        """
+        Restart search_timer on every change of le_search:
+        search when the user stops typing.
+        """
+        self.search_timer.start()
+
+    def is_song_found(self, song: Song, what_searching: str) -> bool:
+        """
+        Check if the song's title, date, category or genres contain
+        what_searching (normalized by title_key, like the trigram index).
+        """
+        return (what_searching in title_key(song.title) or
+                 what_searching in format_date(song.last_performed) or
+                  what_searching in title_key(song.category) or
+                   what_searching in title_key(" ".join(song.genres)))
+
+    @Slot()
+    def search_songs(self) -> None:
         """
-        Get searching_text from the le_search signal textChanged
-        and create output_songbook of search's results.
+        Get searching_text from le_search
+        and create output_songs of search's results.
         """
-        # check if the self.songs_dict (got in show_songs method) is empty.
-        if len(self.songs_dict) == 0:
+        # check if the self.songs (got in show_songs method) is empty.
+        if len(self.songs) == 0 and self.load_task is None:
             QMessageBox.warning(
                 self,
                 "Поиск песен",
                 "Ваш песенник пуст.\n"
                 "Выберите 'Добавить песню' в главном окне.")
-        else:  # search in the titles and last_performed
-            what_searching: str = searching_text.strip().lower()
-            output_songbook: dict = {}  # dict() will contain all results of searcing.
-            for key in sorted(self.songs_dict):
-                if (what_searching in key.lower() or
-                     what_searching in self.songs_dict[key]["last_performed"].lower() or
-                      what_searching in self.songs_dict[key]["category"].lower() or
-                       what_searching in " ".join(self.songs_dict[key]["genres"]).lower()):
-                    output_songbook[key] = self.songs_dict[key]
-            self.show_search_results(output_songbook)
-
-    def show_search_results(self, output_songbook: dict) -> None:
-        """ Show results of searching. """
-        self.ui.lw_songs.clear()
-        output_str: str = ""
-        for key in sorted(output_songbook):
-            desc_str: str = ""
-            output_str = str(key) + ":\n"
-            genres_str: str = ", ".join(output_songbook[key]["genres"])
-            desc_str = " " * (len(output_str) - 1) + genres_str + "\n"
-            desc_str += " " * (len(output_str) - 1) + output_songbook[key]["category"] + "\n"
-            desc_str += " " * (len(output_str) - 1) + output_songbook[key]["last_performed"] + "\n"
-            desc_str += " " * (len(output_str) - 1) + output_songbook[key]["comment"]
-            output_str += desc_str  # [:-1]  # Delete last "\n"
-            current_item: QListWidgetItem = QListWidgetItem(output_str)
-            self.ui.lw_songs.addItem(current_item)
-            if output_songbook[key]["is_recently"] == 1:
-                current_item.setCheckState(Qt.CheckState.Checked)
+            return
+        what_searching: str = title_key(self.ui.le_search.text())
+        if what_searching == "":  # show all songs.
+            self.last_query = ""
+            self.found_songs = []
+            if self.load_task is not None:  # page by page till they're loaded.
+                self.song_model.show_pages(self.fetch_songs_page)
+                self.found_records = 0
+                self.lbl_found_records.setText(
+                    f"{self.str_found_records}{str(self.found_records)}")
             else:
-                current_item.setCheckState(Qt.CheckState.Unchecked)
+                self.show_search_results(list(self.songs))
+            return
+        # search in the titles, last_performed, categories and genres.
+        output_songs: list[Song] = []  # will contain all results of searcing.
+        if self.last_query != "" and what_searching.startswith(self.last_query):
+            # the query is longer: only some of the found songs remain.
+            output_songs = [
+                song for song in self.found_songs
+                if self.is_song_found(song, what_searching)]
+        else:
+            try:
+                # None if what_searching is too short for the trigram index.
+                candidate_ids: set[int] | None = self.my_songbook.search_substring(
+                    what_searching)
+            except DatabaseError:
+                candidate_ids = None
+            if candidate_ids is not None:
+                output_songs = self.songs.ordered(candidate_ids)
+            else:
+                output_songs = [
+                    song for song in self.songs  # already ordered by title.
+                    if self.is_song_found(song, what_searching)]
+        self.last_query = what_searching
+        self.found_songs = output_songs
+        # then the songs found in the texts and comments (the texts are not
+        # normalized, the full-text index folds the case but not ё).
+        snippets: dict[int, str] = {}
+        if len(what_searching) >= FULL_TEXT_SEARCH_MIN_LENGTH:
+            try:
+                found: list = self.my_songbook.search(
+                    self.ui.le_search.text().strip(), FULL_TEXT_SEARCH_LIMIT)
+            except DatabaseError:
+                QMessageBox.critical(
+                    self,
+                    "Поиск песен",
+                    "Ошибка при поиске в текстах песен.")
+            else:
+                found_ids: set[int] = {song.id for song in output_songs}
+                for id_song, snippet in found:
+                    if (self.songs.by_id(id_song) is not None
+                            and id_song not in found_ids):
+                        snippets[id_song] = snippet
+                if snippets:  # all found songs in the order of titles.
+                    output_songs = self.songs.ordered(found_ids | snippets.keys())
+        self.show_search_results(output_songs, snippets)
+
+    def show_search_results(self, output_songs: list[Song],
+                            snippets: dict[int, str] | None = None) -> None:
+        """
+        Show results of searching: song_model removes the rows which are
+        not found any more and inserts the found ones (the rest rows stay).
+        """
+        self.song_model.set_songs(output_songs, snippets)
         # show result's quantity.
         if self.ui.le_search.text().strip() != "":
-            self.found_records = len(output_songbook)
+            self.found_records = len(output_songs)
             self.lbl_found_records.setText(
                 f"{self.str_found_records}{str(self.found_records)}")
         else:
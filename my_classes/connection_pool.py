@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+""" Module contains class ConnectionPool. """
+# Every Songbook INSTANCE used to open its own sqlite3 connection for every
+# single request (and one update_song opened three of them).
+# The pool keeps ONE long-lived connection per thread and per DB file,
+# so all Songbook INSTANCES of the same thread share it.
+# sqlite3 connections can't be shared between threads (check_same_thread),
+# that's why the pool is per-thread.
+
+import os
+import threading
+from collections.abc import Callable
+from sqlite3 import (
+    connect,
+    Connection,
+)
+
+# sqlite3 caches prepared statements per connection (LRU by the SQL text).
+# Songbook uses a fixed set of SQL strings, so they all fit into the cache.
+CACHED_STATEMENTS: int = 256
+
+
+class ConnectionPool:
+    """ Class ConnectionPool to share sqlite3 connections per thread. """
+    _local = threading.local()
+
+    @classmethod
+    def _connections(cls) -> dict:
+        """ Get dict {path_to_db_file: [connection, leases]} of the current thread. """
+        connections: dict | None = getattr(cls._local, "connections", None)
+        if connections is None:
+            connections = {}
+            cls._local.connections = connections
+        return connections
+
+    @classmethod
+    def acquire(cls, path_to_db_file: str,
+                on_connect: Callable[[Connection], None] | None = None) -> Connection:
+        """
+        Get the connection of the current thread to path_to_db_file
+        (open it if needed) and take a lease on it.
+        on_connect is called once for every newly opened connection.
+        """
+        connections: dict = cls._connections()
+        if path_to_db_file not in connections:
+            # if dir of the DB file not exists, create this.
+            os.makedirs(os.path.dirname(path_to_db_file), exist_ok=True)
+            conn = connect(path_to_db_file, cached_statements=CACHED_STATEMENTS)
+            conn.execute("PRAGMA foreign_keys=1")  # enable cascade deleting and updating.
+            # readers don't wait for a writer (SongbookWorker writes in its
+            # own thread while the GUI thread reads), it's kept in the DB file.
+            conn.execute("PRAGMA journal_mode=WAL")
+            if on_connect is not None:
+                try:
+                    on_connect(conn)
+                except Exception:
+                    conn.close()
+                    raise
+            connections[path_to_db_file] = [conn, 0]
+        connections[path_to_db_file][1] += 1
+        return connections[path_to_db_file][0]
+
+    @classmethod
+    def release(cls, path_to_db_file: str) -> None:
+        """
+        Give back the lease on the connection of the current thread.
+        The connection is closed when the last lease is given back.
+        """
+        connections: dict = cls._connections()
+        if path_to_db_file in connections:
+            connections[path_to_db_file][1] -= 1
+            if connections[path_to_db_file][1] <= 0:
+                connections.pop(path_to_db_file)[0].close()
+
+    @classmethod
+    def close_all(cls) -> None:
+        """ Close all connections of the current thread. """
+        connections: dict = cls._connections()
+        for conn, _ in connections.values():
+            conn.close()
+        connections.clear()
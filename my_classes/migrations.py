@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+""" Module contains DB schema migrations of Songbook. """
+# The schema version is stored in the DB itself (PRAGMA user_version).
+# MIGRATIONS[0] brings the DB to the version 1, MIGRATIONS[1] to the
+# version 2 and so on. NEVER change a migration which is already released,
+# add a new one to the end of the list instead.
+# Every migration is a tuple of single SQL statements (not a script),
+# so all of them are run in ONE transaction together with the new
+# user_version (executescript() would commit after every statement).
+
+from sqlite3 import (
+    Connection,
+    DatabaseError,
+)
+
+from my_classes.song import title_key
+
+MIGRATIONS: list[tuple[str, ...]] = [
+    # 1: initial schema (IF NOT EXISTS: DBs created before the versioning
+    # already have these tables).
+    (
+        """\
+        CREATE TABLE IF NOT EXISTS genres(
+           id INTEGER PRIMARY KEY NOT NULL,
+           genre TEXT UNIQUE NOT NULL COLLATE NOCASE
+        )""",
+        """\
+        CREATE TABLE IF NOT EXISTS categories(
+           id INTEGER PRIMARY KEY NOT NULL,
+           category TEXT UNIQUE NOT NULL COLLATE NOCASE
+        )""",
+        """\
+        CREATE TABLE IF NOT EXISTS songs(
+           id INTEGER PRIMARY KEY NOT NULL,
+           title TEXT UNIQUE NOT NULL COLLATE NOCASE,
+           id_category INTEGER NOT NULL,
+           song_image TEXT DEFAULT "" COLLATE NOCASE,
+           song_text TEXT DEFAULT "" COLLATE NOCASE,
+           last_performed TEXT NOT NULL COLLATE NOCASE,
+           is_recently INTEGER DEFAULT 0,
+           comment TEXT DEFAULT "" COLLATE NOCASE,
+           FOREIGN KEY(id_category) REFERENCES categories(id) ON DELETE CASCADE ON UPDATE CASCADE
+        )""",
+        """\
+        CREATE TABLE IF NOT EXISTS songs_genres(
+           id_song INTEGER NOT NULL,
+           id_genre INTEGER NOT NULL,
+           PRIMARY KEY (id_song, id_genre),
+           FOREIGN KEY(id_song) REFERENCES songs(id) ON DELETE CASCADE ON UPDATE CASCADE,
+           FOREIGN KEY(id_genre) REFERENCES genres(id) ON DELETE CASCADE ON UPDATE CASCADE
+        )""",
+    ),
+    # 2: indexes for the child sides of the foreign keys. Without them
+    # ON DELETE CASCADE of a genre (category) scans all songs_genres (songs)
+    # and so would any "songs of the genre (category) X" request.
+    # (id_genre, id_song) covers the link, the table is not read at all.
+    (
+        """\
+        CREATE INDEX IF NOT EXISTS idx_songs_genres_id_genre
+        ON songs_genres(id_genre, id_song)""",
+        """\
+        CREATE INDEX IF NOT EXISTS idx_songs_id_category
+        ON songs(id_category)""",
+    ),
+    # 3: last_performed was stored as "dd.MM.yyyy" which can't be sorted
+    # or compared, store it as ISO "yyyy-MM-dd" ("dd.MM.yyyy" is only
+    # the format to show it). The index is for date ranges and ordering.
+    (
+        """\
+        UPDATE songs
+        SET last_performed=substr(last_performed, 7, 4) || '-' ||
+                           substr(last_performed, 4, 2) || '-' ||
+                           substr(last_performed, 1, 2)
+        WHERE last_performed GLOB '[0-9][0-9].[0-9][0-9].[0-9][0-9][0-9][0-9]'""",
+        """\
+        CREATE INDEX IF NOT EXISTS idx_songs_last_performed
+        ON songs(last_performed)""",
+    ),
+    # 4: full-text index over titles, texts and comments. It's an external
+    # content table (the texts are not stored twice) kept in sync with
+    # songs by the triggers. prefix: the index of 2 and 3 first characters
+    # of every token for fast prefix requests (see Songbook.search).
+    (
+        """\
+        CREATE VIRTUAL TABLE IF NOT EXISTS songs_fts USING fts5(
+           title, song_text, comment,
+           content='songs', content_rowid='id',
+           tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )""",
+        """\
+        CREATE TRIGGER IF NOT EXISTS songs_fts_after_insert
+        AFTER INSERT ON songs BEGIN
+           INSERT INTO songs_fts(rowid, title, song_text, comment)
+           VALUES(new.id, new.title, new.song_text, new.comment);
+        END""",
+        """\
+        CREATE TRIGGER IF NOT EXISTS songs_fts_after_delete
+        AFTER DELETE ON songs BEGIN
+           INSERT INTO songs_fts(songs_fts, rowid, title, song_text, comment)
+           VALUES('delete', old.id, old.title, old.song_text, old.comment);
+        END""",
+        """\
+        CREATE TRIGGER IF NOT EXISTS songs_fts_after_update
+        AFTER UPDATE OF title, song_text, comment ON songs BEGIN
+           INSERT INTO songs_fts(songs_fts, rowid, title, song_text, comment)
+           VALUES('delete', old.id, old.title, old.song_text, old.comment);
+           INSERT INTO songs_fts(rowid, title, song_text, comment)
+           VALUES(new.id, new.title, new.song_text, new.comment);
+        END""",
+        # index the songs which are already in DB.
+        "INSERT INTO songs_fts(songs_fts) VALUES('rebuild')",
+    ),
+    # 5: trigram index for the substring search ("contains") in the titles
+    # and the dates as the user sees them (dd.MM.yyyy). It's a regular
+    # FTS5 table (the shown date is not stored in songs), rowid=songs.id.
+    (
+        """\
+        CREATE VIRTUAL TABLE IF NOT EXISTS songs_trigram USING fts5(
+           title, last_performed, tokenize='trigram'
+        )""",
+        """\
+        CREATE TRIGGER IF NOT EXISTS songs_trigram_after_insert
+        AFTER INSERT ON songs BEGIN
+           INSERT INTO songs_trigram(rowid, title, last_performed)
+           VALUES(new.id, new.title,
+                  CASE WHEN length(new.last_performed)=10
+                  THEN substr(new.last_performed, 9, 2) || '.' ||
+                       substr(new.last_performed, 6, 2) || '.' ||
+                       substr(new.last_performed, 1, 4)
+                  ELSE new.last_performed END);
+        END""",
+        """\
+        CREATE TRIGGER IF NOT EXISTS songs_trigram_after_delete
+        AFTER DELETE ON songs BEGIN
+           DELETE FROM songs_trigram WHERE rowid=old.id;
+        END""",
+        """\
+        CREATE TRIGGER IF NOT EXISTS songs_trigram_after_update
+        AFTER UPDATE OF title, last_performed ON songs BEGIN
+           UPDATE songs_trigram
+           SET title=new.title,
+               last_performed=CASE WHEN length(new.last_performed)=10
+                              THEN substr(new.last_performed, 9, 2) || '.' ||
+                                   substr(new.last_performed, 6, 2) || '.' ||
+                                   substr(new.last_performed, 1, 4)
+                              ELSE new.last_performed END
+           WHERE rowid=old.id;
+        END""",
+        # index the songs which are already in DB.
+        """\
+        INSERT INTO songs_trigram(rowid, title, last_performed)
+        SELECT id, title,
+               CASE WHEN length(last_performed)=10
+               THEN substr(last_performed, 9, 2) || '.' ||
+                    substr(last_performed, 6, 2) || '.' ||
+                    substr(last_performed, 1, 4)
+               ELSE last_performed END
+        FROM songs""",
+    ),
+    # 6: change log. Every change of songs, their genres, genres and
+    # categories is logged by the triggers (also the changes done by other
+    # programs and by ON DELETE CASCADE), so a reader can get only what
+    # changed since its last seq (see Songbook.changes_since).
+    # AUTOINCREMENT: seq of the pruned entries are never used again.
+    # A renamed genre (category) changes its songs, they're logged too.
+    (
+        """\
+        CREATE TABLE IF NOT EXISTS change_log(
+           seq INTEGER PRIMARY KEY AUTOINCREMENT,
+           entity TEXT NOT NULL,
+           id_entity INTEGER NOT NULL,
+           op TEXT NOT NULL
+        )""",
+        """\
+        CREATE TRIGGER IF NOT EXISTS change_log_songs_after_insert
+        AFTER INSERT ON songs BEGIN
+           INSERT INTO change_log(entity, id_entity, op)
+           VALUES('song', new.id, 'insert');
+        END""",
+        """\
+        CREATE TRIGGER IF NOT EXISTS change_log_songs_after_update
+        AFTER UPDATE ON songs BEGIN
+           INSERT INTO change_log(entity, id_entity, op)
+           VALUES('song', new.id, 'update');
+        END""",
+        """\
+        CREATE TRIGGER IF NOT EXISTS change_log_songs_after_delete
+        AFTER DELETE ON songs BEGIN
+           INSERT INTO change_log(entity, id_entity, op)
+           VALUES('song', old.id, 'delete');
+        END""",
+        """\
+        CREATE TRIGGER IF NOT EXISTS change_log_songs_genres_after_insert
+        AFTER INSERT ON songs_genres BEGIN
+           INSERT INTO change_log(entity, id_entity, op)
+           VALUES('song', new.id_song, 'update');
+        END""",
+        """\
+        CREATE TRIGGER IF NOT EXISTS change_log_songs_genres_after_delete
+        AFTER DELETE ON songs_genres BEGIN
+           INSERT INTO change_log(entity, id_entity, op)
+           VALUES('song', old.id_song, 'update');
+        END""",
+        """\
+        CREATE TRIGGER IF NOT EXISTS change_log_genres_after_insert
+        AFTER INSERT ON genres BEGIN
+           INSERT INTO change_log(entity, id_entity, op)
+           VALUES('genre', new.id, 'insert');
+        END""",
+        """\
+        CREATE TRIGGER IF NOT EXISTS change_log_genres_after_update
+        AFTER UPDATE ON genres BEGIN
+           INSERT INTO change_log(entity, id_entity, op)
+           VALUES('genre', new.id, 'update');
+           INSERT INTO change_log(entity, id_entity, op)
+           SELECT 'song', id_song, 'update' FROM songs_genres
+           WHERE id_genre=new.id;
+        END""",
+        """\
+        CREATE TRIGGER IF NOT EXISTS change_log_genres_after_delete
+        AFTER DELETE ON genres BEGIN
+           INSERT INTO change_log(entity, id_entity, op)
+           VALUES('genre', old.id, 'delete');
+        END""",
+        """\
+        CREATE TRIGGER IF NOT EXISTS change_log_categories_after_insert
+        AFTER INSERT ON categories BEGIN
+           INSERT INTO change_log(entity, id_entity, op)
+           VALUES('category', new.id, 'insert');
+        END""",
+        """\
+        CREATE TRIGGER IF NOT EXISTS change_log_categories_after_update
+        AFTER UPDATE ON categories BEGIN
+           INSERT INTO change_log(entity, id_entity, op)
+           VALUES('category', new.id, 'update');
+           INSERT INTO change_log(entity, id_entity, op)
+           SELECT 'song', id, 'update' FROM songs
+           WHERE id_category=new.id;
+        END""",
+        """\
+        CREATE TRIGGER IF NOT EXISTS change_log_categories_after_delete
+        AFTER DELETE ON categories BEGIN
+           INSERT INTO change_log(entity, id_entity, op)
+           VALUES('category', old.id, 'delete');
+        END""",
+    ),
+    # 7: songs.title_key = title_key(title) (see my_classes.song): COLLATE
+    # NOCASE folds only ASCII, so "Песня" and "песня" were different titles
+    # for the UNIQUE index. The key is written by Songbook (not by a trigger:
+    # other programs don't have the title_key() function). The titles which
+    # are already the same by the key get unique keys (the key, the unit
+    # separator and the id), so they can be renamed.
+    # The trigram index searches the keys instead of the titles.
+    (
+        "ALTER TABLE songs ADD COLUMN title_key TEXT",
+        "UPDATE songs SET title_key=title_key(title)",
+        """\
+        UPDATE songs SET title_key=title_key || char(31) || id
+        WHERE id NOT IN (SELECT MIN(id) FROM songs GROUP BY title_key)""",
+        """\
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_songs_title_key
+        ON songs(title_key)""",
+        "DROP TRIGGER IF EXISTS songs_trigram_after_insert",
+        "DROP TRIGGER IF EXISTS songs_trigram_after_update",
+        """\
+        CREATE TRIGGER IF NOT EXISTS songs_trigram_after_insert
+        AFTER INSERT ON songs BEGIN
+           INSERT INTO songs_trigram(rowid, title, last_performed)
+           VALUES(new.id, new.title_key,
+                  CASE WHEN length(new.last_performed)=10
+                  THEN substr(new.last_performed, 9, 2) || '.' ||
+                       substr(new.last_performed, 6, 2) || '.' ||
+                       substr(new.last_performed, 1, 4)
+                  ELSE new.last_performed END);
+        END""",
+        """\
+        CREATE TRIGGER IF NOT EXISTS songs_trigram_after_update
+        AFTER UPDATE OF title_key, last_performed ON songs BEGIN
+           UPDATE songs_trigram
+           SET title=new.title_key,
+               last_performed=CASE WHEN length(new.last_performed)=10
+                              THEN substr(new.last_performed, 9, 2) || '.' ||
+                                   substr(new.last_performed, 6, 2) || '.' ||
+                                   substr(new.last_performed, 1, 4)
+                              ELSE new.last_performed END
+           WHERE rowid=old.id;
+        END""",
+        "UPDATE songs_trigram SET title="
+        "(SELECT title_key FROM songs WHERE songs.id=songs_trigram.rowid)",
+    ),
+    # 8: bulk insert mode. While bulk_insert_mode has a row, the per-row
+    # triggers of the inserted songs (both indexes and the change log) do
+    # nothing, Songbook.insert_songs_bulk fills them set-based instead.
+    # The row is inserted and deleted in the SAME transaction, so no other
+    # connection ever sees it. The triggers are guarded by WHEN and not
+    # dropped: a schema change would invalidate the prepared statements.
+    (
+        """        CREATE TABLE IF NOT EXISTS bulk_insert_mode(
+           active INTEGER NOT NULL
+        )""",
+        "DROP TRIGGER IF EXISTS songs_fts_after_insert",
+        "DROP TRIGGER IF EXISTS songs_trigram_after_insert",
+        "DROP TRIGGER IF EXISTS change_log_songs_after_insert",
+        "DROP TRIGGER IF EXISTS change_log_songs_genres_after_insert",
+        """        CREATE TRIGGER IF NOT EXISTS songs_fts_after_insert
+        AFTER INSERT ON songs
+        WHEN NOT EXISTS (SELECT 1 FROM bulk_insert_mode) BEGIN
+           INSERT INTO songs_fts(rowid, title, song_text, comment)
+           VALUES(new.id, new.title, new.song_text, new.comment);
+        END""",
+        """        CREATE TRIGGER IF NOT EXISTS songs_trigram_after_insert
+        AFTER INSERT ON songs
+        WHEN NOT EXISTS (SELECT 1 FROM bulk_insert_mode) BEGIN
+           INSERT INTO songs_trigram(rowid, title, last_performed)
+           VALUES(new.id, new.title_key,
+                  CASE WHEN length(new.last_performed)=10
+                  THEN substr(new.last_performed, 9, 2) || '.' ||
+                       substr(new.last_performed, 6, 2) || '.' ||
+                       substr(new.last_performed, 1, 4)
+                  ELSE new.last_performed END);
+        END""",
+        """        CREATE TRIGGER IF NOT EXISTS change_log_songs_after_insert
+        AFTER INSERT ON songs
+        WHEN NOT EXISTS (SELECT 1 FROM bulk_insert_mode) BEGIN
+           INSERT INTO change_log(entity, id_entity, op)
+           VALUES('song', new.id, 'insert');
+        END""",
+        """        CREATE TRIGGER IF NOT EXISTS change_log_songs_genres_after_insert
+        AFTER INSERT ON songs_genres
+        WHEN NOT EXISTS (SELECT 1 FROM bulk_insert_mode) BEGIN
+           INSERT INTO change_log(entity, id_entity, op)
+           VALUES('song', new.id_song, 'update');
+        END""",
+    ),
+    # 9: genres.genre_key and categories.category_key = title_key(name)
+    # like songs.title_key (see the migration 7): "Поп" and "поп" were
+    # different names for the UNIQUE COLLATE NOCASE columns. The names
+    # which are already the same by the key get unique keys (the key,
+    # the unit separator and the id).
+    (
+        "ALTER TABLE genres ADD COLUMN genre_key TEXT",
+        "UPDATE genres SET genre_key=title_key(genre)",
+        """        UPDATE genres SET genre_key=genre_key || char(31) || id
+        WHERE id NOT IN (SELECT MIN(id) FROM genres GROUP BY genre_key)""",
+        """        CREATE UNIQUE INDEX IF NOT EXISTS idx_genres_genre_key
+        ON genres(genre_key)""",
+        "ALTER TABLE categories ADD COLUMN category_key TEXT",
+        "UPDATE categories SET category_key=title_key(category)",
+        """        UPDATE categories SET category_key=category_key || char(31) || id
+        WHERE id NOT IN (SELECT MIN(id) FROM categories GROUP BY category_key)""",
+        """        CREATE UNIQUE INDEX IF NOT EXISTS idx_categories_category_key
+        ON categories(category_key)""",
+    ),
+]
+
+SCHEMA_VERSION: int = len(MIGRATIONS)
+
+
+def get_schema_version(conn: Connection) -> int:
+    """ Get the schema version stored in the DB. """
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: Connection) -> None:
+    """
+    Bring the DB schema up to SCHEMA_VERSION.
+    It's a no-op (one PRAGMA) if the DB is up to date.
+    The title_key() SQL function (migrations 7 and 9) is registered
+    on the connection, Songbook's requests use it too.
+    """
+    conn.create_function("title_key", 1, title_key, deterministic=True)
+    if get_schema_version(conn) == SCHEMA_VERSION:
+        return
+    try:
+        # IMMEDIATE: take the write lock before reading the version again,
+        # so two programs can't run the same migration twice.
+        conn.execute("BEGIN IMMEDIATE")
+        version: int = get_schema_version(conn)
+        if version > SCHEMA_VERSION:
+            raise DatabaseError(
+                f"DB schema version {version} is newer than "
+                f"the program's one {SCHEMA_VERSION}.")
+        for migration in MIGRATIONS[version:]:
+            for sql in migration:
+                conn.execute(sql)
+        # PRAGMA doesn't accept parameters.
+        conn.execute(f"PRAGMA user_version={SCHEMA_VERSION:d}")
+    except DatabaseError as err:
+        conn.rollback()
+        raise DatabaseError("migrate", err)
+    else:
+        conn.commit()  # complete ALL migrations with the new version.
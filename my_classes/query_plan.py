@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Check query plans of all requests of Songbook.
+Run it from the project dir before a release:
+    python -m my_classes.query_plan
+It fills a temporary DB, calls every public method of Songbook,
+runs EXPLAIN QUERY PLAN for every request which was issued
+and exits with 1 if a request scans a whole large table
+or a foreign key has no index on its child side.
+"""
+import os
+import re
+import sys
+import tempfile
+import types
+from sqlite3 import Connection
+
+from my_classes.song import Song
+from my_classes.songbook import Songbook
+
+# Tables which grow with the songbook.
+LARGE_TABLES: tuple[str, ...] = ("songs", "songs_genres", "change_log")
+# Methods which don't issue requests.
+NOT_REQUESTING: tuple[str, ...] = ("close", "interrupt")
+# Methods which read or delete ALL songs by design.
+FULL_SCAN_ALLOWED: tuple[str, ...] = (
+    "get_songs",
+    "get_songs_count",
+    "iter_songs",
+    "get_titles_from_db",
+    "clear_db",
+)
+NUMBER_OF_SONGS: int = 1000
+
+_FULL_SCAN = re.compile(
+    r"^SCAN (" + "|".join(LARGE_TABLES) + r")\b")
+# a scan in the order of an index which is stopped by LIMIT is fine.
+_INDEX_ORDER_SCAN = re.compile(r"USING (COVERING )?INDEX ")
+_LIMIT = re.compile(r"\bLIMIT\b", re.IGNORECASE)
+_EXPLAINABLE = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b",
+                          re.IGNORECASE)
+
+
+def _fill_in(songbook: Songbook, number_of_songs: int) -> None:
+    """ Fill in the DB with genres, categories and songs. """
+    songbook.insert_genres_into_db([f"Genre {i}" for i in range(20)])
+    songbook.insert_categories_into_db([f"Category {i}" for i in range(10)])
+    for i in range(number_of_songs):
+        songbook.insert_song_into_db(Song(
+            None, f"Song {i:06}", (f"Genre {i % 20}", f"Genre {(i + 7) % 20}"),
+            f"Category {i % 10}", "", f"Text {i}", "2024-01-01", 0, ""))
+
+
+def _calls() -> list[tuple[str, tuple]]:
+    """
+    Get calls (method name, args) of all public methods of Songbook.
+    Methods which change DB go last, in the order they can be done.
+    """
+    new_song = Song(None, "New song", ("Genre 1",), "Category 1",
+                    "", "New text", "2024-01-01", 1, "New comment")
+    return [
+        ("get_songs", ()),
+        ("get_songs_count", ()),
+        ("get_songs_page", (None, 50)),
+        ("get_songs_page", ("Song 000500", 50)),
+        ("get_songs_page", (("2024-01-01", 500), 50, "last_performed")),
+        ("iter_songs", (100,)),
+        ("iter_songs", (100, "last_performed", "songs.last_performed >= :date",
+                        {"date": "2024-06-01"}, True)),
+        ("get_songs_by_ids", ([1, 2, 3],)),
+        ("get_song", (1,)),
+        ("get_the_song", ("Song 000001",)),
+        ("resolve_ids", (["Song 000001", "song 000002", "No song"],)),
+        ("title_exists", ("song 000001",)),
+        ("title_exists", ("Song 000001", 2)),
+        ("get_songs_performed_between", ("2024-01-01", "2024-12-31")),
+        ("get_least_recently_performed", (10,)),
+        ("search", ("text 12", 10)),
+        ("search_substring", ("ng 00",)),
+        ("get_song_text", (2,)),
+        ("prefetch_song_texts", ([3, 4, 5],)),
+        ("clear_text_cache", ()),
+        ("data_version", ()),
+        ("get_change_seq", ()),
+        ("changes_since", (100,)),
+        ("prune_change_log", (5000,)),
+        ("get_titles_from_db", ()),
+        ("get_categories_from_db", ()),
+        ("get_genres_from_db", ()),
+        ("insert_genres_into_db", (["New genre"],)),
+        ("insert_categories_into_db", (["New category"],)),
+        ("add_genres", (["Added genre", "genre 1"],)),
+        ("add_categories", (["Added category", "CATEGORY 1"],)),
+        ("insert_song_into_db", (new_song,)),
+        ("insert_songs_bulk", ([
+            Song(None, "Bulk song 1", ("Genre 1", "genre 2"), "category 3",
+                 "", "Bulk text 1", "2024-01-01", 0, ""),
+            Song(None, "New song", ("Genre 1",), "Category 1",
+                 "", "", "2024-01-01", 0, ""),
+        ],)),
+        ("update_genres", ("New genre", "Renamed genre")),
+        ("update_categories", ("New category", "Renamed category")),
+        ("update_song", ("New song", Song(
+            None, "Renamed song", ("Genre 2", "Genre 3"), "Category 2",
+            "", "Renamed text", "2024-01-02", 0, ""))),
+        ("update_song_by_id", (5, Song(
+            5, "Song 000004", ("Genre 4",), "Category 4",
+            "", "Updated text", "2024-01-03", 1, ""))),
+        ("delete_songs_by_ids", ([14, 15],)),
+        ("delete_songs_from_db", (["Song 000010", "Song 000011"],)),
+        ("delete_multi_records", (["Song 000012", "Song 000013"],)),
+        ("delete_genres_from_db", (["Renamed genre"],)),
+        ("delete_categories_from_db", (["Renamed category"],)),
+        ("clear_db", ()),
+    ]
+
+
+def _check_foreign_keys(conn: Connection) -> list[str]:
+    """ Check if every foreign key has an index on its child columns. """
+    problems: list[str] = []
+    tables: list[str] = [
+        row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table'")]
+    for table in tables:
+        # first column of every index of the table.
+        first_columns: set[str] = set()
+        for index in conn.execute(f"PRAGMA index_list({table})").fetchall():
+            columns = conn.execute(f"PRAGMA index_info({index[1]})").fetchall()
+            if columns:
+                first_columns.add(columns[0][2])
+        for foreign_key in conn.execute(f"PRAGMA foreign_key_list({table})"):
+            child_column: str = foreign_key[3]
+            if child_column not in first_columns:
+                problems.append(
+                    f"{table}.{child_column} -> {foreign_key[2]}: "
+                    "no index for the foreign key, "
+                    "ON DELETE/UPDATE CASCADE scans the whole table.")
+    return problems
+
+
+def check_query_plans(number_of_songs: int = NUMBER_OF_SONGS) -> list[str]:
+    """ Get the list of problems (it's empty if all plans are fine). """
+    problems: list[str] = []
+    with tempfile.TemporaryDirectory() as path_to_dir:
+        songbook = Songbook(
+            path_to_db_file=os.path.join(path_to_dir, "songbook.db"))
+        conn: Connection = songbook._conn
+        _fill_in(songbook, number_of_songs)
+        problems.extend(_check_foreign_keys(conn))
+
+        # {sql: name of the method which issued it}
+        issued: dict[str, str] = {}
+        current_method: list[str] = [""]
+        conn.set_trace_callback(
+            lambda sql: issued.setdefault(sql, current_method[0]))
+
+        calls: list[tuple[str, tuple]] = _calls()
+        public_methods: set[str] = {
+            name for name in dir(Songbook)
+            if not name.startswith("_") and callable(getattr(Songbook, name))
+            and name not in NOT_REQUESTING}
+        for name in sorted(public_methods - {name for name, _ in calls}):
+            problems.append(f"{name}: not checked, add it to _calls().")
+
+        for name, args in calls:
+            current_method[0] = name
+            result = getattr(songbook, name)(*args)
+            if isinstance(result, types.GeneratorType):
+                for _ in result:  # its requests are issued while it's read.
+                    pass
+        conn.set_trace_callback(None)
+
+        for sql, name in issued.items():
+            if not _EXPLAINABLE.match(sql):
+                continue
+            for row in conn.execute("EXPLAIN QUERY PLAN " + sql):
+                if (_FULL_SCAN.match(row[3]) and name not in FULL_SCAN_ALLOWED
+                        and not (_INDEX_ORDER_SCAN.search(row[3])
+                                 and _LIMIT.search(sql))):
+                    problems.append(
+                        f"{name}: {row[3]}\n    {' '.join(sql.split())}")
+        songbook.close()
+    return problems
+
+
+if __name__ == "__main__":
+    found_problems: list[str] = check_query_plans()
+    for problem in found_problems:
+        print(problem)
+    print(f"Problems: {len(found_problems)}")
+    sys.exit(1 if found_problems else 0)
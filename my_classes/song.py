@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+""" Module contains classes Song and SongCollection. """
+# The whole songbook is kept in memory by MainWindow, so a song record
+# must be as small as possible: Song has __slots__ (no per-song __dict__)
+# and the genres and category strings (and even the tuples of genres) are
+# shared between songs (see SongCollection.intern), not duplicated per song.
+
+import bisect
+
+# Song.last_performed is stored as ISO date (it can be sorted and compared
+# by DB), the user sees it as dd.MM.yyyy. Both are QDate formats.
+DATE_FORMAT: str = "yyyy-MM-dd"
+DISPLAY_DATE_FORMAT: str = "dd.MM.yyyy"
+
+
+# SQLite's COLLATE NOCASE folds only ASCII letters and then compares
+# UTF-8 bytes, which is the same as the order of code points.
+_NOCASE = str.maketrans(
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+def nocase_key(title: str) -> str:
+    """ Get the sort key of title which is the same as COLLATE NOCASE. """
+    return title.translate(_NOCASE)
+
+
+def title_key(title: str) -> str:
+    """
+    Get the normalized key of title (songs.title_key): Unicode case
+    folding (unlike COLLATE NOCASE), ё is е and the whitespace is
+    collapsed, so "Ёлка  Песня" and "елка песня" are the same title.
+    """
+    return " ".join(title.casefold().replace("ё", "е").split())
+
+
+def format_date(date: str) -> str:
+    """ Get the date in DISPLAY_DATE_FORMAT from the date in DATE_FORMAT. """
+    if len(date) != 10:  # not an ISO date, show it as is.
+        return date
+    return f"{date[8:10]}.{date[5:7]}.{date[:4]}"
+
+
+class Song:
+    """ Class Song: one record of the songbook. """
+    __slots__ = (
+        "id",
+        "title",
+        "genres",
+        "category",
+        "song_image",
+        "song_text",
+        "last_performed",
+        "is_recently",
+        "comment",
+    )
+
+    def __init__(self,
+                 id: int | None,
+                 title: str,
+                 genres: tuple[str, ...],
+                 category: str,
+                 song_image: str = "",
+                 song_text: str | None = "",
+                 last_performed: str = "",
+                 is_recently: int = 0,
+                 comment: str = ""):
+        self.id: int | None = id  # None for a song which is not in DB yet.
+        self.title: str = title
+        self.genres: tuple[str, ...] = genres
+        self.category: str = category
+        self.song_image: str = song_image
+        # None if the text is not loaded (see Songbook.get_song_text).
+        self.song_text: str | None = song_text
+        self.last_performed: str = last_performed  # in DATE_FORMAT.
+        self.is_recently: int = is_recently
+        self.comment: str = comment
+
+    def __repr__(self) -> str:
+        return f"Song(id={self.id!r}, title={self.title!r})"
+
+
+class SongChanges:
+    """
+    Class SongChanges: ids of the songs inserted, updated (including
+    the changes of their genres or category) and deleted by Songbook.
+    """
+    __slots__ = ("inserted", "updated", "deleted")
+
+    def __init__(self, inserted=(), updated=(), deleted=()):
+        self.inserted: set[int] = set(inserted)
+        self.updated: set[int] = set(updated)
+        self.deleted: set[int] = set(deleted)
+
+    def __bool__(self) -> bool:
+        return bool(self.inserted or self.updated or self.deleted)
+
+    def __repr__(self) -> str:
+        return (f"SongChanges(inserted={self.inserted!r}, "
+                f"updated={self.updated!r}, deleted={self.deleted!r})")
+
+    def merge(self, other: "SongChanges") -> "SongChanges":
+        """ Add the changes of other (done after these ones) to these ones. """
+        # in place and by the ids of other only (not by all ids of these
+        # changes), so merging many small changes is not quadratic.
+        # An id of a deleted song may be given to a new one.
+        self.deleted -= other.inserted
+        self.deleted |= other.deleted
+        self.inserted |= other.inserted
+        self.inserted -= other.deleted
+        # the updated ids are never inserted or deleted ones.
+        self.updated -= other.inserted
+        self.updated -= other.deleted
+        self.updated |= other.updated - self.deleted - self.inserted
+        return self
+
+
+class SongCollection:
+    """
+    Class SongCollection: songs ordered by title
+    and indexed by id and by title.
+    """
+    __slots__ = ("_songs", "_by_id", "_by_title", "_interned")
+
+    def __init__(self):
+        self._songs: list[Song] = []
+        self._by_id: dict[int, Song] = {}
+        self._by_title: dict[str, Song] = {}
+        # the same genre, category and tuple of genres for all songs.
+        self._interned: dict = {}
+
+    def __len__(self) -> int:
+        return len(self._songs)
+
+    def __iter__(self):
+        return iter(self._songs)
+
+    def __getitem__(self, index: int) -> Song:
+        return self._songs[index]
+
+    def __contains__(self, title: str) -> bool:
+        return title in self._by_title
+
+    def intern(self, value):
+        """ Get the shared copy of value (str or tuple of str). """
+        return self._interned.setdefault(value, value)
+
+    def append(self, song: Song) -> None:
+        """
+        Append the song to the end of the collection
+        (songs must be appended in the order of titles).
+        """
+        self._index(song)
+        self._songs.append(song)
+
+    def _index(self, song: Song) -> None:
+        """ Share the genres and category of the song and index it. """
+        song.genres = self.intern(tuple(self.intern(genre) for genre in song.genres))
+        song.category = self.intern(song.category)
+        self._by_id[song.id] = song
+        self._by_title[song.title] = song
+
+    def by_id(self, id_song: int) -> Song | None:
+        """ Get the song by its id. """
+        return self._by_id.get(id_song)
+
+    def by_title(self, title: str) -> Song | None:
+        """ Get the song by its title. """
+        return self._by_title.get(title)
+
+    def apply(self, ids_songs: set[int], songs: list[Song]) -> None:
+        """
+        Remove the songs with ids_songs (deleted or changed ones) and add
+        songs (their new versions and the inserted ones) in the order of titles.
+        """
+        if ids_songs:
+            for id_song in ids_songs:
+                song: Song | None = self._by_id.pop(id_song, None)
+                if song is not None:
+                    del self._by_title[song.title]
+            self._songs = [song for song in self._songs if song.id not in ids_songs]
+        if songs:
+            for song in songs:
+                self._index(song)
+            self._songs.extend(songs)
+            # almost sorted: it's a merge of two sorted runs.
+            self._songs.sort(key=lambda song: nocase_key(song.title))
+
+    def page(self, after_title: str | None, limit: int) -> list[Song]:
+        """
+        Get up to limit songs following the song with after_title
+        (from the first song if it's None), like Songbook.get_songs_page().
+        """
+        start: int = 0
+        if after_title is not None:
+            start = bisect.bisect_right(
+                self._songs, nocase_key(after_title),
+                key=lambda song: nocase_key(song.title))
+        return self._songs[start:start + limit]
+
+    def ordered(self, ids_songs) -> list[Song]:
+        """
+        Get the songs of the collection with ids_songs ordered by title
+        (without scanning the whole collection).
+        """
+        songs: list[Song] = [
+            self._by_id[id_song] for id_song in ids_songs
+            if id_song in self._by_id]
+        songs.sort(key=lambda song: nocase_key(song.title))
+        return songs
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+""" Module contains class SongItemDelegate. """
+# A row of the list of songs used to be one padded multi-line string built
+# for every song (and the title was searched back in it).
+# SongItemDelegate paints the fields straight from the Song record of the
+# row (SongListModel.data(index, SONG_ROLE)), every line is elided to the
+# width of the row. The font metrics are computed once per font.
+
+from PySide6.QtCore import (
+    Qt,
+    QModelIndex,
+    QSize,
+)
+from PySide6.QtGui import (
+    QFont,
+    QFontMetrics,
+    QPainter,
+    QPalette,
+)
+from PySide6.QtWidgets import (
+    QApplication,
+    QStyle,
+    QStyledItemDelegate,
+    QStyleOptionViewItem,
+)
+
+from my_classes.song import (
+    Song,
+    format_date,
+)
+from my_classes.song_list_model import (
+    SONG_ROLE,
+    SNIPPET_ROLE,
+)
+
+# title, genres, category, last_performed and comment (with the snippet).
+LINES: int = 5
+# the fields under the title are indented by this number of spaces.
+INDENT: int = 4
+MARGIN: int = 2  # px above and below the lines.
+
+
+class SongItemDelegate(QStyledItemDelegate):
+    """ Class SongItemDelegate to paint the rows of the list of songs. """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # the font of the last painted row and its metrics.
+        self._font: QFont | None = None
+        self._metrics: QFontMetrics | None = None
+        self._line_height: int = 0
+        self._indent: int = 0
+
+    def _update_metrics(self, font: QFont) -> QFontMetrics:
+        """ Get the metrics of font (compute them if the font is changed). """
+        if self._font is None or font != self._font:
+            self._font = QFont(font)
+            self._metrics = QFontMetrics(font)
+            self._line_height = self._metrics.lineSpacing()
+            self._indent = self._metrics.horizontalAdvance(" " * INDENT)
+        return self._metrics
+
+    def sizeHint(self, option: QStyleOptionViewItem, index: QModelIndex) -> QSize:
+        self._update_metrics(option.font)
+        return QSize(option.rect.width(), LINES * self._line_height + 2 * MARGIN)
+
+    def paint(self, painter: QPainter, option: QStyleOptionViewItem,
+              index: QModelIndex) -> None:
+        song: Song | None = index.data(SONG_ROLE)
+        if song is None:
+            super().paint(painter, option, index)
+            return
+        metrics: QFontMetrics = self._update_metrics(option.font)
+
+        # the background, selection, focus and check box without the text.
+        opt = QStyleOptionViewItem(option)
+        self.initStyleOption(opt, index)
+        opt.text = ""
+        style: QStyle = opt.widget.style() if opt.widget else QApplication.style()
+        style.drawControl(QStyle.ControlElement.CE_ItemViewItem, opt, painter, opt.widget)
+        text_rect = style.subElementRect(
+            QStyle.SubElement.SE_ItemViewItemText, opt, opt.widget)
+
+        comment: str = song.comment
+        snippet: str = index.data(SNIPPET_ROLE) or ""
+        if snippet != "":  # found in the text or comment.
+            comment = f"{comment}  {snippet}" if comment != "" else snippet
+        lines: tuple[tuple[int, str], ...] = (
+            (0, song.title + ":"),
+            (self._indent, ", ".join(song.genres)),
+            (self._indent, song.category),
+            (self._indent, format_date(song.last_performed)),
+            (self._indent, comment),
+        )
+
+        painter.save()
+        painter.setFont(opt.font)
+        if opt.state & QStyle.StateFlag.State_Selected:
+            painter.setPen(opt.palette.color(QPalette.ColorRole.HighlightedText))
+        else:
+            painter.setPen(opt.palette.color(QPalette.ColorRole.Text))
+        y: int = text_rect.top() + MARGIN + metrics.ascent()
+        for indent, text in lines:
+            width: int = text_rect.width() - indent
+            if width > 0:
+                painter.drawText(
+                    text_rect.left() + indent, y,
+                    metrics.elidedText(text, Qt.TextElideMode.ElideRight, width))
+            y += self._line_height
+        painter.restore()
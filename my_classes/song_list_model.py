@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+""" Module contains class SongListModel. """
+# MainWindow used to create a QListWidgetItem (with its padded text,
+# check state and colour) for EVERY song. SongListModel keeps only the list
+# of Song records (shared with SongCollection), QListView asks data()
+# for the rows it paints, so nothing is built for the rows out of sight.
+# The rows are painted from the Song records by SongItemDelegate.
+# All songs are shown page by page (see show_pages): the view asks for
+# the next page (fetchMore) when it's scrolled to the last row.
+
+from collections.abc import Callable
+
+from PySide6.QtCore import (
+    Qt,
+    QAbstractListModel,
+    QModelIndex,
+)
+from PySide6.QtGui import QBrush
+
+from my_classes.song import Song
+
+# the roles to get the Song record of the row, its id
+# and the snippet of the text (if it's found by the full-text search).
+SONG_ROLE: int = Qt.ItemDataRole.UserRole
+ID_ROLE: int = Qt.ItemDataRole.UserRole + 1
+SNIPPET_ROLE: int = Qt.ItemDataRole.UserRole + 2
+# set_songs() updates the shown rows by removing and inserting ranges of rows.
+# If there are more ranges than this, resetting the model is cheaper.
+MAX_CHANGED_RANGES: int = 100
+
+
+class SongListModel(QAbstractListModel):
+    """ Class SongListModel: the songs shown in the list of songs. """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # songs in the order of rows and {id_song: row}.
+        self._songs: list[Song] = []
+        self._rows: dict[int, int] = {}
+        # {id_song: snippet} of the songs found by the full-text search.
+        self._snippets: dict[int, str] = {}
+        # gets the next page after the last shown song (see show_pages).
+        self._fetch: Callable[[Song | None], list[Song]] | None = None
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid():  # it's a list, rows have no children.
+            return 0
+        return len(self._songs)
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlag:
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        # the check box only shows is_recently, it's not user checkable.
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self._songs):
+            return None
+        song: Song = self._songs[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:  # for the keyboard search.
+            return song.title
+        if role == Qt.ItemDataRole.CheckStateRole:
+            if song.is_recently == 1:
+                return Qt.CheckState.Checked
+            return Qt.CheckState.Unchecked
+        if role == Qt.ItemDataRole.ForegroundRole:
+            return QBrush(Qt.GlobalColor.red if song.is_recently == 1
+                          else Qt.GlobalColor.black)
+        if role == SONG_ROLE:
+            return song
+        if role == ID_ROLE:
+            return song.id
+        if role == SNIPPET_ROLE:
+            return self._snippets.get(song.id)
+        return None
+
+    def canFetchMore(self, parent: QModelIndex = QModelIndex()) -> bool:
+        return not parent.isValid() and self._fetch is not None
+
+    def fetchMore(self, parent: QModelIndex = QModelIndex()) -> None:
+        if parent.isValid() or self._fetch is None:
+            return
+        songs: list[Song] = self._fetch(self._songs[-1] if self._songs else None)
+        if not songs:  # all pages are shown.
+            self._fetch = None
+            return
+        self.append_songs(songs)
+
+    def song(self, row: int) -> Song:
+        """ Get the song of the row. """
+        return self._songs[row]
+
+    def songs(self) -> list[Song]:
+        """ Get the shown songs in the order of rows. """
+        return self._songs
+
+    def row_of(self, id_song: int) -> int:
+        """ Get the row of the song (-1 if it's not shown). """
+        return self._rows.get(id_song, -1)
+
+    def show_pages(self, fetch: Callable[[Song | None], list[Song]]) -> None:
+        """
+        Show songs page by page instead of all rows: fetch(the last shown
+        song or None) gets the next page (an empty list if there are
+        no more songs). The first page is shown at once, the next ones
+        when the view is scrolled to the end.
+        """
+        self.beginResetModel()
+        self._songs = []
+        self._rows = {}
+        self._snippets = {}
+        self._fetch = fetch
+        self.endResetModel()
+        self.fetchMore()
+
+    def reset_songs(self, songs) -> None:
+        """ Show songs (newly loaded Song records) instead of all rows. """
+        self._fetch = None
+        self.beginResetModel()
+        self._songs = list(songs)
+        self._rows = {song.id: row for row, song in enumerate(self._songs)}
+        self._snippets = {}
+        self.endResetModel()
+
+    def append_songs(self, songs: list[Song]) -> None:
+        """ Add rows of songs (the next loaded ones) after the last row. """
+        if not songs:
+            return
+        first: int = len(self._songs)
+        self.beginInsertRows(QModelIndex(), first, first + len(songs) - 1)
+        self._songs.extend(songs)
+        for row, song in enumerate(songs, first):
+            self._rows[song.id] = row
+        self.endInsertRows()
+
+    def set_songs(self, songs: list[Song],
+                  snippets: dict[int, str] | None = None) -> None:
+        """
+        Show songs (in the same order as the shown ones, some of them
+        are not shown now, others are new): the rows which are not in songs
+        are removed, the new ones are inserted, the rest rows (and the
+        selection of them) stay, the rows of the changed Song records
+        (with the same id) are repainted.
+        """
+        snippets = snippets or {}
+        self._fetch = None  # all of them are shown.
+        new_ids: set[int] = {song.id for song in songs}
+        # [first row, last row] of the removed rows (in the current rows)
+        # and of the inserted ones (in the new rows).
+        removed: list[list[int]] = self._get_ranges(
+            row for row, song in enumerate(self._songs) if song.id not in new_ids)
+        inserted: list[list[int]] = self._get_ranges(
+            row for row, song in enumerate(songs) if song.id not in self._rows)
+
+        if len(removed) + len(inserted) > MAX_CHANGED_RANGES:
+            self.beginResetModel()
+            self._songs = list(songs)
+            self._rows = {song.id: row for row, song in enumerate(self._songs)}
+            self._snippets = snippets
+            self.endResetModel()
+            return
+
+        self._remove_ranges(removed)
+        # the rest rows are in the same order as in songs, so every range
+        # is inserted right where it's in songs.
+        for first, last in inserted:
+            self.beginInsertRows(QModelIndex(), first, last)
+            self._songs[first:first] = songs[first:last + 1]
+            self.endInsertRows()
+        # the same ids in the same order now, but the records may be new.
+        changed_rows: list[int] = [
+            row for row, (song, new_song) in enumerate(zip(self._songs, songs))
+            if song is not new_song]
+        self._songs = list(songs)
+        self._rows = {song.id: row for row, song in enumerate(self._songs)}
+        for row in changed_rows:
+            index: QModelIndex = self.index(row)
+            self.dataChanged.emit(index, index)
+
+        # the rows of which the snippets are changed.
+        changed_ids: list[int] = [
+            id_song for id_song in self._snippets.keys() | snippets.keys()
+            if self._snippets.get(id_song) != snippets.get(id_song)]
+        self._snippets = snippets
+        for id_song in changed_ids:
+            if id_song in self._rows:
+                index = self.index(self._rows[id_song])
+                self.dataChanged.emit(index, index, [SNIPPET_ROLE])
+
+    def remove_songs(self, ids_songs: set[int]) -> None:
+        """ Remove the rows of the songs with ids_songs (the rest rows stay). """
+        self._remove_ranges(self._get_ranges(
+            row for row, song in enumerate(self._songs) if song.id in ids_songs))
+        self._rows = {song.id: row for row, song in enumerate(self._songs)}
+        for id_song in ids_songs:
+            self._snippets.pop(id_song, None)
+
+    @staticmethod
+    def _get_ranges(rows) -> list[list[int]]:
+        """ Get [first row, last row] of the ranges of the ascending rows. """
+        ranges: list[list[int]] = []
+        for row in rows:
+            if ranges and ranges[-1][1] == row - 1:
+                ranges[-1][1] = row
+            else:
+                ranges.append([row, row])
+        return ranges
+
+    def _remove_ranges(self, ranges: list[list[int]]) -> None:
+        """ Remove the ranges of rows (without updating self._rows). """
+        # from the end: the rows before a removed range keep their numbers.
+        for first, last in reversed(ranges):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self._songs[first:last + 1]
+            self.endRemoveRows()
@@ -2,176 +2,717 @@
 """ Module contains class Songbook. """
 # ====== Songbook for my own using ======
 # = Example how my Songbook looks like. =
-# songbook = {
-#     "Song 1": {
-#         genre: "genre 1",
-#         categories: ["category 1", "category 2"],
-#         song_image: "path to Song 1 image",
-#         song_text: "path to Song 1 text",
-#         last_performed: "01.01.2024",
-#         is_recently: 0,
-#         comment: "Comment for Song 1"
-#     },
-#     "Song 2": {
-#         genre: "genre 2",
-#         categories: ["category 1", "category 2"],
-#         song_image: "path to Song 2 image",
-#         song_text: "path to Song 2 text",
-#         last_performed: "01.02.2024",
-#         is_recently: 0,
-#         comment: "Comment for Song 2"
-#     },
-# }
+# songbook = SongCollection(  # ordered by title, indexed by id and title.
+#     Song(
+#         id=1,
+#         title="Song 1",
+#         genres=("genre 1", "genre 2"),
+#         category="category 1",
+#         song_image="path to Song 1 image",
+#         song_text="Song 1 text",
+#         last_performed="2024-01-01",  # shown as 01.01.2024
+#         is_recently=0,
+#         comment="Comment for Song 1"
+#     ),
+#     Song(
+#         id=2,
+#         title="Song 2",
+#         ...
+#     ),
+# )
+# All methods which change DB return SongChanges: ids of the inserted,
+# updated and deleted songs (so the shown songs can be updated
+# without loading all of them again, see Songbook.get_songs_by_ids).
+# insert_songs_bulk() returns the songs it has rejected too.
+# The ids of genres and categories are looked up in the cache (see _NameIds),
+# it's loaded again after a change of them by any Songbook INSTANCE
+# or by another connection (PRAGMA data_version).
+# Titles are compared by songs.title_key (see my_classes.song.title_key)
+# which Songbook writes with every title: it's case-insensitive for any
+# letters, not only for ASCII ones like COLLATE NOCASE.
 
+import json
 import os
+import threading
+from collections import OrderedDict
+from collections.abc import Iterator
 from sqlite3 import (
-    connect,
+    Connection,
     DatabaseError,
 )
+from my_classes.connection_pool import ConnectionPool
+from my_classes.migrations import migrate
+from my_classes.song import (
+    Song,
+    SongChanges,
+    SongCollection,
+    title_key,
+)
+
+# Genres of a song are aggregated by GROUP_CONCAT into one string
+# with this separator (the unit separator can't be typed in a genre).
+GENRES_SEPARATOR: str = "\x1f"
+# GENRES_SEPARATOR as an SQL expression (for GROUP_CONCAT).
+_GENRES_SEPARATOR_SQL: str = f"char({ord(GENRES_SEPARATOR)})"
+
+# How many song texts Songbook keeps in its LRU cache by default.
+TEXT_CACHE_SIZE: int = 64
+
+# Marks of the found words in the snippets of Songbook.search().
+SNIPPET_START: str = "["
+SNIPPET_END: str = "]"
+# The trigram index (Songbook.search_substring) works from this length.
+TRIGRAM_MIN_LENGTH: int = 3
+
+# How many last entries of the change log are kept by prune_change_log().
+CHANGE_LOG_SIZE: int = 10000
+
+# How many songs Songbook.iter_songs() yields at once by default.
+ITER_BATCH_SIZE: int = 500
+# The orders of iter_songs(): ORDER BY of every order (both are
+# the orders of indexes, so the songs are not sorted by the DB).
+SONG_ORDERS: dict[str, str] = {
+    "title": "songs.title",
+    # the index on last_performed has id as its last column.
+    "last_performed": "songs.last_performed, songs.id",
+}
+# The conditions of get_songs_page(): the songs after the key of the last
+# song of the previous page (see song_page_key) in every order.
+# It's a range of the index, not OFFSET which reads all skipped songs.
+_PAGE_CONDITIONS: dict[str, str] = {
+    "title": "songs.title > :title",
+    "last_performed": "(songs.last_performed, songs.id) > (:last_performed, :id)",
+}
+
+# The columns of songs which update_song_by_id() compares with a new record.
+_SONG_COLUMNS: tuple[str, ...] = (
+    "title",
+    "title_key",
+    "id_category",
+    "song_image",
+    "song_text",
+    "last_performed",
+    "is_recently",
+    "comment",
+)
+
+# {title: id} of Songbook.resolve_ids(): the song with the title (COLLATE
+# NOCASE, ASCII only), else the only song with the key of the title.
+_RESOLVE_IDS: str = """\
+SELECT json_each.value, COALESCE(
+  (SELECT songs.id FROM songs WHERE songs.title=json_each.value),
+  (SELECT songs.id FROM songs
+   WHERE songs.title_key=title_key(json_each.value)
+   AND NOT EXISTS (
+     SELECT 1 FROM songs AS duplicates
+     WHERE duplicates.title_key > title_key(json_each.value) || char(31)
+     AND duplicates.title_key < title_key(json_each.value) || char(32))))
+FROM json_each(:titles)"""
+
+# Found in a title weighs more than in a comment and more than in a text.
+_SEARCH_WEIGHTS: str = "10.0, 1.0, 2.0"  # title, song_text, comment
+
+# The genres of a song (joined by GENRES_SEPARATOR) in the order of Song.genres.
+_SONG_GENRES: str = f"""\
+(SELECT GROUP_CONCAT(genres.genre, {_GENRES_SEPARATOR_SQL})
+   FROM songs_genres JOIN genres ON genres.id=songs_genres.id_genre
+   WHERE songs_genres.id_song=songs.id)"""
+# One row per song. The songs are scanned in the order of the UNIQUE title
+# index and the genres are aggregated per song, so neither a GROUP BY nor
+# an ORDER BY by title needs a temp b-tree. Songs without genres are
+# skipped like the old inner join over songs_genres did.
+_SELECT_SONGS_TEMPLATE: str = """\
+SELECT
+  songs.id, songs.title,
+  {genres},
+  categories.category, songs.song_image, {song_text},
+  songs.last_performed, songs.is_recently, songs.comment
+FROM songs JOIN categories ON categories.id=songs.id_category
+WHERE EXISTS (SELECT 1 FROM songs_genres WHERE songs_genres.id_song=songs.id)
+"""
+# Songs without their texts (the texts are the most of the DB bytes),
+# Song.song_text is None, get it by Songbook.get_song_text().
+_SELECT_SONGS: str = _SELECT_SONGS_TEMPLATE.format(
+    song_text="NULL", genres=_SONG_GENRES)
+# Songs with their texts.
+_SELECT_FULL_SONGS: str = _SELECT_SONGS_TEMPLATE.format(
+    song_text="songs.song_text", genres=_SONG_GENRES)
+
+
+def _song_from_row(row: tuple) -> Song:
+    """ Create Song from a row of _SELECT_SONGS (_SELECT_FULL_SONGS). """
+    (
+        id_song, title, genres, category, song_image, song_text,
+        last_performed, is_recently, comment
+    ) = row
+    return Song(
+        id_song, title, tuple(genres.split(GENRES_SEPARATOR)), category,
+        song_image, song_text, last_performed, is_recently, comment)
+
+
+def song_page_key(song: Song, order: str = "title") -> str | tuple[str, int]:
+    """
+    Get the key of the song (the last one of a page) to get the next page
+    by Songbook.get_songs_page(): its title or (last_performed, id).
+    """
+    if order == "last_performed":
+        return song.last_performed, song.id
+    return song.title
+
+
+def _fts_query(query: str) -> str:
+    """
+    Get FTS5 MATCH expression from the user's query:
+    every word is a quoted prefix (so the FTS5 syntax can't be broken).
+    """
+    return " ".join(
+        '"' + word.replace('"', '""') + '"*' for word in query.split())
+
+
+class _NameIds:
+    """
+    Class _NameIds: names of genres or categories <-> their ids.
+    Names are looked up by their stored keys (title_key).
+    """
+    __slots__ = ("ids", "names", "exact")
+
+    def __init__(self, rows):
+        # {key: id}, {id: name} and {name: id} of rows (id, name, key).
+        self.ids: dict[str, int] = {}
+        self.names: dict[int, str] = {}
+        self.exact: dict[str, int] = {}
+        for id_name, name, key in rows:
+            # a name added by another program has no key.
+            self.ids.setdefault(title_key(name) if key is None else key, id_name)
+            self.names[id_name] = name
+            self.exact[name] = id_name
+
+    def get_id(self, name: str) -> int | None:
+        """
+        Get id of the name (None if there is no such name).
+        The exact name first: a legacy duplicate has its own key.
+        """
+        id_name: int | None = self.exact.get(name)
+        return id_name if id_name is not None else self.ids.get(title_key(name))
 
 
 class Songbook:
-    """ Class Songbook to manipulate DB data. """
-    def __init__(self):
-        self._songbook: dict = {}
+    """
+    Class Songbook to manipulate DB data.
+    All INSTANCES of the same thread share one long-lived connection
+    (see ConnectionPool), so creating a Songbook INSTANCE is cheap.
+    Use it as a context manager or call close() to give the connection back.
+    Song texts are loaded on demand and kept in the LRU cache
+    of text_cache_size songs.
+    """
+    # it's increased by every change of genres or categories, so the cached
+    # ids of ALL INSTANCES are loaded again (the INSTANCES of the same
+    # thread share the connection, its data_version isn't changed by them).
+    _taxonomy_generation: int = 0
+
+    def __init__(self, text_cache_size: int = TEXT_CACHE_SIZE,
+                 path_to_db_file: str | None = None):
         self._path_to_db: str = f"{os.path.abspath(".")}{os.path.sep}database{os.path.sep}"
-        self._create_db()
+        # another DB file may be passed (e.g. by my_classes.query_plan).
+        self._path_to_db_file: str = path_to_db_file or self._path_to_db + "songbook.db"
+        # the connection belongs to the thread which created the INSTANCE.
+        self._thread_id: int = threading.get_ident()
+        # The schema is created/migrated only once, when the pool opens
+        # a new connection, not on every Songbook().
+        self._conn: Connection | None = ConnectionPool.acquire(
+            self._path_to_db_file, on_connect=migrate)
+        # {id_song: song_text}, the least recently used first.
+        self._text_cache: OrderedDict[int, str] = OrderedDict()
+        self._text_cache_size: int = text_cache_size
+        # the cached ids of genres and categories
+        # and (data_version, _taxonomy_generation) they're loaded at.
+        self._genres: _NameIds | None = None
+        self._categories: _NameIds | None = None
+        self._taxonomy_version: tuple[int, int] | None = None
+
+    def __enter__(self) -> "Songbook":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
 
-    # def __del__(self):
+    def __del__(self):
+        # __del__ may be called from another thread by the garbage collector.
+        if getattr(self, "_thread_id", None) == threading.get_ident():
+            self.close()
 
-    def _create_db(self) -> None:
+    def close(self) -> None:
+        """ Give the shared connection back to the ConnectionPool. """
+        if getattr(self, "_conn", None) is not None:
+            self._conn = None
+            ConnectionPool.release(self._path_to_db_file)
+
+    def get_songs(self) -> SongCollection:
         """
-        Create database and tables if they not exist.
+        Get all songs from DB as SongCollection ordered by title.
+        One row per song (genres are aggregated by the DB).
+        The texts are not loaded (song_text is None),
+        get them by get_song_text().
         """
-        # if dir 'database' not exists or not a dir, create this.
-        if not os.path.exists(self._path_to_db) or not os.path.isdir(self._path_to_db):
-            os.makedirs(self._path_to_db)
+        songs: SongCollection = SongCollection()
+        for batch in self.iter_songs():
+            for song in batch:
+                songs.append(song)
+        return songs
 
-        conn = connect(self._path_to_db + "songbook.db")
-        conn.execute("PRAGMA foreign_keys=1")  # enable cascade deleting and updating.
-        cur = conn.cursor()
-        sql = """\
-        CREATE TABLE IF NOT EXISTS genres(
-           id INTEGER PRIMARY KEY NOT NULL,
-           genre TEXT UNIQUE NOT NULL COLLATE NOCASE
-        );
-        CREATE TABLE IF NOT EXISTS categories(
-           id INTEGER PRIMARY KEY NOT NULL,
-           category TEXT UNIQUE NOT NULL COLLATE NOCASE
-        );
-        CREATE TABLE IF NOT EXISTS songs(
-           id INTEGER PRIMARY KEY NOT NULL,
-           title TEXT UNIQUE NOT NULL COLLATE NOCASE,
-           id_category INTEGER NOT NULL,
-           song_image TEXT DEFAULT "" COLLATE NOCASE,
-           song_text TEXT DEFAULT "" COLLATE NOCASE,
-           last_performed TEXT NOT NULL COLLATE NOCASE,
-           is_recently INTEGER DEFAULT 0,
-           comment TEXT DEFAULT "" COLLATE NOCASE,
-           FOREIGN KEY(id_category) REFERENCES categories(id) ON DELETE CASCADE ON UPDATE CASCADE
-        );
-        CREATE TABLE IF NOT EXISTS songs_genres(
-           id_song INTEGER NOT NULL,
-           id_genre INTEGER NOT NULL,
-           PRIMARY KEY (id_song, id_genre),
-           FOREIGN KEY(id_song) REFERENCES songs(id) ON DELETE CASCADE ON UPDATE CASCADE,
-           FOREIGN KEY(id_genre) REFERENCES genres(id) ON DELETE CASCADE ON UPDATE CASCADE
-        );
+    def iter_songs(self, batch_size: int = ITER_BATCH_SIZE,
+                   order_by: str = "title", where: str = "",
+                   params: dict | None = None,
+                   with_texts: bool = False) -> Iterator[list[Song]]:
+        """
+        Yield the songs by lists of batch_size songs straight from
+        the cursor (only one batch is in memory at once).
+        order_by is a key of SONG_ORDERS, where is an additional SQL
+        condition on songs with :named params (e.g.
+        where="songs.last_performed >= :date", params={"date": "2024-01-01"}).
+        The texts are loaded if with_texts is True.
+        The cursor is closed when the generator is read to the end
+        or closed.
         """
+        if order_by not in SONG_ORDERS:
+            raise ValueError(f"Unknown order of songs: '{order_by}'.")
+        sql: str = _SELECT_FULL_SONGS if with_texts else _SELECT_SONGS
+        if where != "":
+            sql += f"AND ({where})\n"
+        sql += "ORDER BY " + SONG_ORDERS[order_by]
+        cur = self._conn.cursor()
         try:
-            cur.executescript(sql)
+            cur.execute(sql, params or {})
+            while True:
+                rows: list = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [_song_from_row(row) for row in rows]
         except DatabaseError as err:
-            raise DatabaseError("_create_db", err)
+            raise DatabaseError("iter_songs", err)
         finally:
             cur.close()
-            conn.close()
 
-    def get_data_as_dict(self) -> dict:
+    def get_songs_page(self, after_key: str | tuple[str, int] | None,
+                       limit: int, order: str = "title") -> list[Song]:
         """
-        Get data from sqlite3 db and transform them into dict self.songbook.
+        Get up to limit songs (without texts) which follow after_key
+        (got by song_page_key() from the last song of the previous page,
+        None for the first page) in the order "title" or "last_performed".
+        A page is read by the index from its key, so any page is got
+        as fast as the first one.
         """
-        conn = connect(self._path_to_db + "songbook.db")
-        conn.execute("PRAGMA foreign_keys=1")  # enable cascade deleting and updating.
-        cur = conn.cursor()
-        sql = """\
-        SELECT
-          songs.title, genres.genre, categories.category, songs.song_image,
-          songs.song_text, songs.last_performed, songs.is_recently, songs.comment
-        FROM songs, genres, categories, songs_genres
-        WHERE songs.id_category=categories.id 
-          AND songs_genres.id_song=songs.id
-          AND songs_genres.id_genre=genres.id
+        if order not in _PAGE_CONDITIONS:
+            raise ValueError(f"Unknown order of songs: '{order}'.")
+        params: dict = {"limit": limit}
+        sql: str = _SELECT_SONGS
+        if after_key is not None:
+            sql += f"AND {_PAGE_CONDITIONS[order]}\n"
+            if order == "title":
+                params["title"] = after_key
+            else:
+                params["last_performed"], params["id"] = after_key
+        sql += f"ORDER BY {SONG_ORDERS[order]} LIMIT :limit"
+        songs: list[Song] = []
+        cur = self._conn.cursor()
+        try:
+            cur.execute(sql, params)
+        except DatabaseError as err:
+            raise DatabaseError("get_songs_page", err)
+        else:
+            for row in cur:
+                songs.append(_song_from_row(row))
+        finally:
+            cur.close()
+        return songs
+
+    def get_songs_by_ids(self, ids_songs) -> list[Song]:
         """
+        Get the songs (without texts) with ids_songs from DB
+        (the songs which are not in DB any more are skipped).
+        """
+        songs: list[Song] = []
+        if not ids_songs:
+            return songs
+        cur = self._conn.cursor()
         try:
-            cur.execute(sql)
+            # one parameter for any number of ids.
+            cur.execute(
+                _SELECT_SONGS + "AND songs.id IN (SELECT value FROM json_each(:ids))",
+                {"ids": json.dumps(list(ids_songs))})
         except DatabaseError as err:
-            raise DatabaseError("get_data_as_dict", err)
+            raise DatabaseError("get_songs_by_ids", err)
         else:
-            for (
-                title, genre, category, song_image, song_text,
-                last_performed, is_recently, comment
-            ) in cur:
-                self._songbook.setdefault(title, {"genres": []})
-
-                self._songbook[title]["genres"].append(genre)
-                self._songbook[title]["category"] = category
-                self._songbook[title]["song_image"] = song_image
-                self._songbook[title]["song_text"] = song_text
-                self._songbook[title]["last_performed"] = last_performed
-                self._songbook[title]["is_recently"] = is_recently
-                self._songbook[title]["comment"] = comment
+            for row in cur:
+                songs.append(_song_from_row(row))
         finally:
             cur.close()
-            conn.close()
-        return self._songbook
+        return songs
 
-    def get_the_song_as_dict(self, the_title: str) -> dict:
+    def get_songs_count(self) -> int:
+        """ Get the number of songs get_songs() returns. """
+        try:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM songs WHERE EXISTS "
+                "(SELECT 1 FROM songs_genres WHERE songs_genres.id_song=songs.id)"
+            ).fetchone()[0]
+        except DatabaseError as err:
+            raise DatabaseError("get_songs_count", err)
+
+    def get_song(self, id_song: int) -> Song | None:
+        """ Get the song (with its text) from DB by its id. """
+        the_song: Song | None = None
+        cur = self._conn.cursor()
+        try:
+            cur.execute(_SELECT_FULL_SONGS + "AND songs.id=:id_song",
+                        {"id_song": id_song})
+        except DatabaseError as err:
+            raise DatabaseError("get_song", err)
+        else:
+            row: tuple | None = cur.fetchone()
+            if row is not None:
+                the_song = _song_from_row(row)
+        finally:
+            cur.close()
+        return the_song
+
+    def get_the_song(self, the_title: str) -> Song | None:
+        """ Get the song from DB by its title (see get_song). """
+        id_song: int | None = self.resolve_ids([the_title]).get(the_title)
+        if id_song is None:
+            return None
+        return self.get_song(id_song)
+
+    def resolve_ids(self, titles) -> dict[str, int]:
         """
-        Get the song from DB and transform it into dict.
+        Get {title: id_song} of the titles by ONE request: by the title
+        itself, else by its key (see title_key). The titles which are not
+        in DB or are ambiguous are skipped.
         """
-        the_song: dict = {}
-        conn = connect(self._path_to_db + "songbook.db")
-        conn.execute("PRAGMA foreign_keys=1")  # enable cascade deleting and updating.
-        cur = conn.cursor()
-        sql = """\
-        SELECT
-          songs.title, genres.genre, categories.category, songs.song_image,
-          songs.song_text, songs.last_performed, songs.is_recently, songs.comment
-        FROM songs, genres, categories, songs_genres
-        WHERE songs.id_category=categories.id 
-          AND songs_genres.id_song=songs.id
-          AND songs_genres.id_genre=genres.id
-          AND songs.title=:title
+        cur = self._conn.cursor()
+        try:
+            # one parameter for any number of titles. A key is ambiguous if
+            # older duplicates of it are kept as key || char(31) || id
+            # (see migration 7): e.g. "ПЕСНЯ" for "Песня" and "песня".
+            cur.execute(_RESOLVE_IDS, {"titles": json.dumps(list(titles))})
+            ids_songs: dict[str, int] = {
+                title: id_song for title, id_song in cur.fetchall()
+                if id_song is not None}
+        except DatabaseError as err:
+            raise DatabaseError("resolve_ids", err)
+        finally:
+            cur.close()
+        return ids_songs
+
+    def title_exists(self, title: str, exclude_id: int | None = None) -> bool:
         """
+        Check if the title is in DB (compared by title_key),
+        the song with exclude_id (e.g. the edited one) is not counted.
+        The unchanged title of that song is never a conflict:
+        update_song_by_id keeps its stored key (e.g. a legacy duplicate).
+        """
+        try:
+            # ONE row is probed in the UNIQUE index of songs.title_key
+            # and one by the id (BINARY: the same rule as update_song_by_id).
+            return self._conn.execute(
+                "SELECT EXISTS (SELECT 1 FROM songs WHERE title_key=:title_key "
+                "AND (:exclude_id IS NULL OR id<>:exclude_id)) "
+                "AND NOT EXISTS (SELECT 1 FROM songs WHERE id=:exclude_id "
+                "AND title=:title COLLATE BINARY)",
+                {"title_key": title_key(title), "title": title,
+                 "exclude_id": exclude_id}
+            ).fetchone()[0] == 1
+        except DatabaseError as err:
+            raise DatabaseError("title_exists", err)
+
+    def get_songs_performed_between(self, date_from: str,
+                                    date_to: str) -> list[Song]:
+        """
+        Get songs (without texts) last performed from date_from to date_to
+        (both included, yyyy-MM-dd) ordered by last_performed.
+        """
+        songs: list[Song] = []
+        cur = self._conn.cursor()
         try:
-            cur.execute(sql, {"title": the_title})
+            cur.execute(
+                _SELECT_SONGS +
+                "AND songs.last_performed BETWEEN :date_from AND :date_to "
+                "ORDER BY songs.last_performed, songs.id",
+                {"date_from": date_from, "date_to": date_to})
         except DatabaseError as err:
-            raise DatabaseError("get_the_song_as_dict", err)
+            raise DatabaseError("get_songs_performed_between", err)
         else:
-            for (
-                title, genre, category, song_image, song_text,
-                last_performed, is_recently, comment
-            ) in cur:
-                the_song.setdefault(title, {"genres": []})
-
-                the_song[title]["genres"].append(genre)
-                the_song[title]["category"] = category
-                the_song[title]["song_image"] = song_image
-                the_song[title]["song_text"] = song_text
-                the_song[title]["last_performed"] = last_performed
-                the_song[title]["is_recently"] = is_recently
-                the_song[title]["comment"] = comment
+            for row in cur:
+                songs.append(_song_from_row(row))
+        finally:
+            cur.close()
+        return songs
+
+    def get_least_recently_performed(self, limit: int) -> list[Song]:
+        """
+        Get limit songs (without texts) which were performed
+        the longest time ago, the least recently performed first.
+        """
+        songs: list[Song] = []
+        cur = self._conn.cursor()
+        try:
+            cur.execute(
+                _SELECT_SONGS +
+                "ORDER BY songs.last_performed, songs.id LIMIT :limit",
+                {"limit": limit})
+        except DatabaseError as err:
+            raise DatabaseError("get_least_recently_performed", err)
+        else:
+            for row in cur:
+                songs.append(_song_from_row(row))
+        finally:
+            cur.close()
+        return songs
+
+    def search(self, query: str, limit: int) -> list[tuple[int, str]]:
+        """
+        Full-text search in titles, texts and comments.
+        Get up to limit (id_song, snippet) the best matches first (bm25),
+        the found words are marked in the snippet by SNIPPET_START
+        and SNIPPET_END. Every word of query matches as a prefix.
+        """
+        found: list[tuple[int, str]] = []
+        match: str = _fts_query(query)
+        if match == "":
+            return found
+        cur = self._conn.cursor()
+        try:
+            cur.execute(
+                "SELECT rowid, snippet(songs_fts, -1, :start, :end, '…', 8) "
+                "FROM songs_fts WHERE songs_fts MATCH :match "
+                f"ORDER BY bm25(songs_fts, {_SEARCH_WEIGHTS}) LIMIT :limit",
+                {
+                    "start": SNIPPET_START,
+                    "end": SNIPPET_END,
+                    "match": match,
+                    "limit": limit,
+                }
+            )
+        except DatabaseError as err:
+            raise DatabaseError("search", err)
+        else:
+            for id_song, snippet in cur:
+                # the snippet is shown in one line.
+                found.append((id_song, " / ".join(
+                    line.strip() for line in snippet.splitlines() if line.strip())))
+        finally:
+            cur.close()
+        return found
+
+    def search_substring(self, query: str) -> set[int] | None:
+        """
+        Get ids of songs which contain query (case-insensitive) in the title,
+        the date (dd.MM.yyyy), the category or the genres joined by spaces
+        (the same rule as MainWindow.is_song_found).
+        The titles and dates are searched by the trigram index, the genres
+        and categories tables are tiny and searched here. Returns None if
+        query is shorter than TRIGRAM_MIN_LENGTH (then scan the songs).
+        """
+        # the trigram index has the title keys (see migration 7).
+        query = title_key(query)
+        if len(query) < TRIGRAM_MIN_LENGTH:
+            return None
+        ids_songs: set[int] = set()
+        cur = self._conn.cursor()
+        try:
+            cur.execute(
+                "SELECT rowid FROM songs_trigram WHERE songs_trigram MATCH :match",
+                {"match": '"' + query.replace('"', '""') + '"'})
+            ids_songs.update(id_song for id_song, in cur)
+
+            cur.execute("SELECT id, genre FROM genres")
+            genres: list[tuple[int, str]] = [
+                (id_genre, title_key(genre)) for id_genre, genre in cur.fetchall()]
+            ids_genres: list[int] = [
+                id_genre for id_genre, genre in genres if query in genre]
+            if ids_genres:
+                cur.execute(
+                    "SELECT id_song FROM songs_genres WHERE id_genre IN "
+                    f"({', '.join('?' * len(ids_genres))})", ids_genres)
+                ids_songs.update(id_song for id_song, in cur)
+            # a query with a space may span two genres of a song ("pop rock"),
+            # then the joined genres of the songs are searched. The part
+            # before the first space can't span genres, so only the songs
+            # of the genres which contain it are searched.
+            if " " in query:
+                first_part: str = query.split(" ", 1)[0]
+                ids_first_genres: list[int] = [
+                    id_genre for id_genre, genre in genres if first_part in genre]
+                if ids_first_genres:
+                    cur.execute(
+                        "SELECT songs.id FROM songs WHERE songs.id IN "
+                        "(SELECT id_song FROM songs_genres WHERE id_genre IN "
+                        "(SELECT value FROM json_each(:ids_genres))) "
+                        "AND instr(title_key(replace("
+                        f"{_SONG_GENRES}, {_GENRES_SEPARATOR_SQL}, ' ')), :query)",
+                        {"ids_genres": json.dumps(ids_first_genres), "query": query})
+                    ids_songs.update(id_song for id_song, in cur)
+
+            cur.execute("SELECT id, category FROM categories")
+            ids_categories: list[int] = [
+                id_category for id_category, category in cur.fetchall()
+                if query in title_key(category)]
+            if ids_categories:
+                cur.execute(
+                    "SELECT id FROM songs WHERE id_category IN "
+                    f"({', '.join('?' * len(ids_categories))})", ids_categories)
+                ids_songs.update(id_song for id_song, in cur)
+        except DatabaseError as err:
+            raise DatabaseError("search_substring", err)
+        finally:
+            cur.close()
+        return ids_songs
+
+    def get_song_text(self, id_song: int) -> str:
+        """ Get the song text by id_song from the LRU cache or DB. """
+        if id_song in self._text_cache:
+            self._text_cache.move_to_end(id_song)  # the most recently used.
+        else:
+            self.prefetch_song_texts([id_song])
+        return self._text_cache.get(id_song, "")
+
+    def prefetch_song_texts(self, ids_songs: list[int]) -> None:
+        """
+        Load the texts of the songs which are not in the LRU cache yet
+        by one request (e.g. the neighbours of the current song).
+        """
+        missing_ids: list[int] = [
+            id_song for id_song in ids_songs if id_song not in self._text_cache]
+        if len(missing_ids) == 0:
+            return
+        cur = self._conn.cursor()
+        placeholders: str = ", ".join("?" * len(missing_ids))
+        try:
+            cur.execute(
+                f"SELECT id, song_text FROM songs WHERE id IN ({placeholders})",
+                missing_ids)
+        except DatabaseError as err:
+            raise DatabaseError("prefetch_song_texts", err)
+        else:
+            for id_song, song_text in cur:
+                self._text_cache[id_song] = song_text or ""
+            while len(self._text_cache) > self._text_cache_size:
+                self._text_cache.popitem(last=False)  # the least recently used.
+        finally:
+            cur.close()
+
+    def clear_text_cache(self, ids_songs=None) -> None:
+        """
+        Forget the cached texts of the songs with ids_songs (all of them
+        if it's None), e.g. after the songs were changed by another
+        Songbook INSTANCE.
+        """
+        if ids_songs is None:
+            self._text_cache.clear()
+        else:
+            for id_song in ids_songs:
+                self._text_cache.pop(id_song, None)
+
+    def interrupt(self) -> None:
+        """
+        Interrupt the request running on the connection of this INSTANCE.
+        It's the only method which may be called from another thread
+        (e.g. to cancel a request of SongbookWorker), the interrupted
+        request raises DatabaseError.
+        """
+        if self._conn is not None:
+            self._conn.interrupt()
+
+    def data_version(self) -> int:
+        """
+        Get PRAGMA data_version: it's changed when ANOTHER connection
+        (e.g. another program) commits a change of DB.
+        It's a cheap check if changes_since() has to be called.
+        """
+        try:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+        except DatabaseError as err:
+            raise DatabaseError("data_version", err)
+
+    def get_change_seq(self) -> int:
+        """ Get seq of the last change of DB (0 if nothing is logged). """
+        try:
+            # the last seq given by AUTOINCREMENT (even if it's pruned).
+            return self._conn.execute(
+                "SELECT COALESCE("
+                "(SELECT seq FROM sqlite_sequence WHERE name='change_log'), "
+                "0)").fetchone()[0]
+        except DatabaseError as err:
+            raise DatabaseError("get_change_seq", err)
+
+    def changes_since(self, seq: int) -> tuple[int, SongChanges, set[str]] | None:
+        """
+        Get the changes of DB after seq (got by get_change_seq() or by
+        the previous changes_since()): (the last seq, the changed songs,
+        the changed entities other than songs: "genre", "category").
+        Returns None if the log is pruned after seq (load all data again).
+        """
+        # {id_song: the resulting op}: the log is collapsed in ONE pass,
+        # SongChanges are built once at the end.
+        ops: dict[int, str] = {}
+        entities: set[str] = set()
+        last_seq: int = seq
+        cur = self._conn.cursor()
+        try:
+            # seq of the first kept entry (of the next one if all entries
+            # are pruned). seq has no gaps, so if it's after seq + 1,
+            # the changes after seq are pruned.
+            cur.execute(
+                "SELECT COALESCE("
+                "(SELECT MIN(seq) FROM change_log), "
+                "(SELECT seq + 1 FROM sqlite_sequence WHERE name='change_log'), "
+                "1)")
+            if cur.fetchone()[0] > seq + 1:
+                return None
+            cur.execute(
+                "SELECT seq, entity, id_entity, op FROM change_log "
+                "WHERE seq > :seq ORDER BY seq",
+                {"seq": seq})
+            for last_seq, entity, id_entity, op in cur:
+                if entity != "song":
+                    entities.add(entity)
+                elif op == "update":
+                    # an inserted (deleted) song stays inserted (deleted).
+                    ops.setdefault(id_entity, op)
+                else:
+                    # the last insert or delete wins (like SongChanges.merge).
+                    ops[id_entity] = op
+        except DatabaseError as err:
+            raise DatabaseError("changes_since", err)
+        finally:
+            cur.close()
+        changes: SongChanges = SongChanges(
+            inserted=(id_song for id_song, op in ops.items() if op == "insert"),
+            updated=(id_song for id_song, op in ops.items() if op == "update"),
+            deleted=(id_song for id_song, op in ops.items() if op == "delete"),
+        )
+        return last_seq, changes, entities
+
+    def prune_change_log(self, keep: int = CHANGE_LOG_SIZE) -> None:
+        """ Delete all entries of the change log except the last keep ones. """
+        cur = self._conn.cursor()
+        try:
+            cur.execute(
+                "DELETE FROM change_log "
+                "WHERE seq <= (SELECT MAX(seq) FROM change_log) - :keep",
+                {"keep": keep})
+        except DatabaseError as err:
+            self._conn.rollback()  # don't leave the shared connection in a transaction.
+            raise DatabaseError("prune_change_log", err)
+        else:
+            self._conn.commit()  # complete transaction.
         finally:
             cur.close()
-            conn.close()
-        return the_song
 
     def get_titles_from_db(self) -> list[str]:
         """ Get songs titles from DB. """
         titles: list = []
-        conn = connect(self._path_to_db + "songbook.db")
-        conn.execute("PRAGMA foreign_keys=1")  # enable cascade deleting and updating.
-        cur = conn.cursor()
+        cur = self._conn.cursor()
         try:
             cur.execute("SELECT title FROM songs")
         except DatabaseError as err:
@@ -181,18 +722,16 @@ class Songbook:
                 titles.append(title[0])
         finally:
             cur.close()
-            conn.close()
 
         return titles
 
     def get_categories_from_db(self) -> list[str]:
         """ Get categories from DB. """
         categories: list = []
-        conn = connect(self._path_to_db + "songbook.db")
-        conn.execute("PRAGMA foreign_keys=1")  # enable cascade deleting and updating.
-        cur = conn.cursor()
+        cur = self._conn.cursor()
         try:
-            cur.execute("SELECT category FROM categories")
+            # in the order they were added (the planner may read them by an index).
+            cur.execute("SELECT category FROM categories ORDER BY id")
         except DatabaseError as err:
             raise DatabaseError("get_categories_from_db", err)
         else:
@@ -200,18 +739,16 @@ class Songbook:
                 categories.append(category[0])
         finally:
             cur.close()
-            conn.close()
 
         return categories
 
     def get_genres_from_db(self) -> list[str]:
         """ Get genres from DB. """
         genres: list = []
-        conn = connect(self._path_to_db + "songbook.db")
-        conn.execute("PRAGMA foreign_keys=1")  # enable cascade deleting and updating.
-        cur = conn.cursor()
+        cur = self._conn.cursor()
         try:
-            cur.execute("SELECT genre FROM genres")
+            # in the order they were added (the planner may read them by an index).
+            cur.execute("SELECT genre FROM genres ORDER BY id")
         except DatabaseError as err:
             raise DatabaseError("get_genres_from_db", err)
         else:
@@ -219,81 +756,87 @@ class Songbook:
                 genres.append(genre[0])
         finally:
             cur.close()
-            conn.close()
 
         return genres
 
-    def insert_genres_into_db(self, genres: list[str]) -> None:
-        """ Insert genres into the table genres of DB. """
-        conn = connect(self._path_to_db + "songbook.db")
-        conn.execute("PRAGMA foreign_keys=1")  # enable cascade deleting and updating.
-        cur = conn.cursor()
+    def insert_genres_into_db(self, genres: list[str]) -> SongChanges:
+        """ Insert genres into the table genres of DB (no songs are changed). """
+        cur = self._conn.cursor()
         try:
             for genre in genres:
-                cur.execute("INSERT INTO genres(genre) VALUES(:genre)",
-                        {"genre": genre})
+                cur.execute(
+                    "INSERT INTO genres(genre, genre_key) VALUES(:genre, :genre_key)",
+                    {"genre": genre, "genre_key": title_key(genre)})
         except DatabaseError as err:
+            self._conn.rollback()  # don't leave the shared connection in a transaction.
             raise DatabaseError("insert_genres_into_db", err)
         else:
-            conn.commit()  # complete transaction
+            self._conn.commit()  # complete transaction
+            self._invalidate_taxonomy()
         finally:
             cur.close()
-            conn.close()
+        return SongChanges()
 
-    def insert_categories_into_db(self, categories: list[str]) -> None:
-        """ Insert categories into the table categories of DB. """
-        conn = connect(self._path_to_db + "songbook.db")
-        conn.execute("PRAGMA foreign_keys=1")  # enable cascade deleting and updating.
-        cur = conn.cursor()
+    def insert_categories_into_db(self, categories: list[str]) -> SongChanges:
+        """ Insert categories into the table categories of DB (no songs are changed). """
+        cur = self._conn.cursor()
         try:
             for category in categories:
-                cur.execute("INSERT INTO categories(category) VALUES(:category)",
-                        {"category": category})
+                cur.execute(
+                    "INSERT INTO categories(category, category_key) "
+                    "VALUES(:category, :category_key)",
+                    {"category": category, "category_key": title_key(category)})
         except DatabaseError as err:
+            self._conn.rollback()  # don't leave the shared connection in a transaction.
             raise DatabaseError("insert_categories_into_db", err)
         else:
-            conn.commit()  # complete transaction
+            self._conn.commit()  # complete transaction
+            self._invalidate_taxonomy()
         finally:
             cur.close()
-            conn.close()
+        return SongChanges()
+
+    def add_genres(self, genres) -> tuple[list[str], list[str]]:
+        """
+        Add genres which are not in DB yet (no songs are changed).
+        Returns (the added genres, the genres which are already in DB).
+        """
+        return self._add_names("genres", "genre", genres)
+
+    def add_categories(self, categories) -> tuple[list[str], list[str]]:
+        """
+        Add categories which are not in DB yet (no songs are changed).
+        Returns (the added categories, the categories which are already in DB).
+        """
+        return self._add_names("categories", "category", categories)
 
-    def insert_song_into_db(self, song: dict) -> None:
+    def insert_song_into_db(self, song: Song) -> SongChanges:
         """ Insert a song into the songs table of DB. """
-        conn = connect(self._path_to_db + "songbook.db")
-        conn.execute("PRAGMA foreign_keys=1")  # enable cascade deleting and updating.
-        cur = conn.cursor()
+        cur = self._conn.cursor()
 
-        id_category: int = self._get_id_category(song["category"])
+        id_category: int = self._get_id_category(song.category)
         try:
             cur.execute(
-                "INSERT INTO songs(title, id_category, song_image, song_text, "
-                                   "last_performed, is_recently, comment) "
-                "VALUES(:title, :id_category, :song_image, :song_text, "
-                       ":last_performed, :is_recently, :comment) ",
+                "INSERT INTO songs(title, title_key, id_category, song_image, "
+                                   "song_text, last_performed, is_recently, comment) "
+                "VALUES(:title, :title_key, :id_category, :song_image, "
+                       ":song_text, :last_performed, :is_recently, :comment) ",
                 {
-                    "title": song["title"],
+                    "title": song.title,
+                    "title_key": title_key(song.title),
                     "id_category": id_category,
-                    "song_image": song["song_image"],
-                    "song_text": song["song_text"],
-                    "last_performed": song["last_performed"],
-                    "is_recently": song["is_recently"],
-                    "comment": song["comment"],
+                    "song_image": song.song_image,
+                    "song_text": song.song_text,
+                    "last_performed": song.last_performed,
+                    "is_recently": song.is_recently,
+                    "comment": song.comment,
                 }
             )
             # I need the NEW song_id for the just inserted song (and genres_ids)!
-            cur.execute(
-                "SELECT id FROM songs WHERE title=:title",
-                {"title": song["title"]}
-            )
-            id_song: int = cur.fetchone()[0]
-            # id_song: int = self._get_id_song(title)  # Doesn't work in this
-            # case because the conn.commit() will be executed after ALL
-            # transactions and a NEW CURSOR in a NEW CONNECT in the _get_id_song
-            # doesn't see id and title of the new inserting song because of
-            # incompletted transaction above.
-            # I need ALL inserts to be completted for ALL tables!!!
-            # And then I do conn.commit().
-            ids_genres: list = self._get_ids_genres(song["genres"])
+            id_song: int = cur.lastrowid
+            # All inserts are done in the same transaction of the shared
+            # connection and self._conn.commit() is called after ALL of them.
+            ids_genres: list = self._get_ids_genres(song.genres)
 
             for id_genre in ids_genres:
                 cur.execute(
@@ -302,185 +845,374 @@ class Songbook:
                     {"id_song": id_song, "id_genre": id_genre}
                 )
         except DatabaseError as err:
+            self._conn.rollback()  # don't leave the shared connection in a transaction.
             raise DatabaseError("insert_song_into_db", err)
         else:
-            conn.commit()  # complete ALL transactions!
+            self._conn.commit()  # complete ALL transactions!
         finally:
             cur.close()
-            conn.close()
+        return SongChanges(inserted=(id_song,))
 
-    def delete_categories_from_db(self, categories: list[str]) -> None:
-        """ Delete categories from the DB. """
-        conn = connect(self._path_to_db + "songbook.db")
-        conn.execute("PRAGMA foreign_keys=1")  # enable cascade deleting and updating.
-        cur = conn.cursor()
+    def insert_songs_bulk(self, songs) -> tuple[SongChanges, list[tuple[Song, str]]]:
+        """
+        Insert many songs (e.g. an import) in ONE transaction: the genres
+        and categories are resolved by their names loaded once, the songs
+        and their links to genres are inserted by executemany() and
+        the indexes and the change log are filled set-based (see the
+        migration 8).
+        A song which can't be inserted (its title is already in DB or
+        repeated, its category or a genre is unknown, it has no genres)
+        is skipped and returned with the reason, the rest are inserted.
+        """
+        songs = list(songs)
+        keys: list[str] = [title_key(song.title) for song in songs]
+        accepted: list[Song] = []
+        rejected: list[tuple[Song, str]] = []
+        ids_songs: list[int] = []
+        cur = self._conn.cursor()
         try:
-            for category in categories:
-                cur.execute("DELETE FROM categories WHERE category=:category",
-                            {"category": category})
+            # the transaction is begun explicitly: the existing titles are
+            # read under the write lock, so nobody inserts them meanwhile.
+            if not self._conn.in_transaction:
+                cur.execute("BEGIN IMMEDIATE")
+            genres, categories = self._get_name_ids()
+            # only the incoming keys are probed in the UNIQUE index.
+            cur.execute(
+                "SELECT title_key FROM songs WHERE title_key IN "
+                "(SELECT value FROM json_each(:keys))",
+                {"keys": json.dumps(keys)})
+            titles: set[str] = {key for key, in cur}
+
+            for song, title in zip(songs, keys):
+                if title == "":
+                    rejected.append((song, "no title"))
+                elif title in titles:
+                    rejected.append((song, "the title already exists"))
+                elif categories.get_id(song.category) is None:
+                    rejected.append((song, f"unknown category '{song.category}'"))
+                elif not song.genres:
+                    rejected.append((song, "no genres"))
+                elif any(genres.get_id(genre) is None for genre in song.genres):
+                    rejected.append((song, "unknown genre"))
+                else:
+                    titles.add(title)
+                    accepted.append(song)
+
+            if accepted:
+                # the per-row triggers of the inserts do nothing till
+                # the row is deleted (in this transaction).
+                cur.execute("INSERT INTO bulk_insert_mode(active) VALUES(1)")
+                cur.executemany(
+                    "INSERT INTO songs(title, title_key, id_category, song_image, "
+                                       "song_text, last_performed, is_recently, comment) "
+                    "VALUES(?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        (song.title, title_key(song.title),
+                         categories.get_id(song.category),
+                         song.song_image, song.song_text, song.last_performed,
+                         song.is_recently, song.comment)
+                        for song in accepted
+                    )
+                )
+                # executemany() can't return the new ids, so they're got
+                # by ONE request in the same transaction: {index in accepted: id}.
+                cur.execute(
+                    "SELECT json_each.key, songs.id FROM json_each(:titles) "
+                    "JOIN songs ON songs.title_key=json_each.value",
+                    {"titles": json.dumps([title_key(song.title) for song in accepted])})
+                new_ids: dict[int, int] = dict(cur.fetchall())
+                ids_songs = [new_ids[index] for index in range(len(accepted))]
+                cur.executemany(
+                    "INSERT INTO songs_genres(id_song, id_genre) VALUES(?, ?)",
+                    (
+                        (id_song, id_genre)
+                        for id_song, song in zip(ids_songs, accepted)
+                        # a genre may be repeated in a different case.
+                        for id_genre in dict.fromkeys(
+                            genres.get_id(genre) for genre in song.genres)
+                    )
+                )
+                # what the triggers would do, but by one request each.
+                # A new song is logged once: its links add nothing to 'insert'.
+                params: dict = {"ids": json.dumps(ids_songs)}
+                cur.execute(
+                    "INSERT INTO songs_fts(rowid, title, song_text, comment) "
+                    "SELECT id, title, song_text, comment FROM songs "
+                    "WHERE id IN (SELECT value FROM json_each(:ids))",
+                    params)
+                cur.execute(
+                    "INSERT INTO songs_trigram(rowid, title, last_performed) "
+                    "SELECT id, title_key, "
+                    "CASE WHEN length(last_performed)=10 "
+                    "THEN substr(last_performed, 9, 2) || '.' || "
+                    "substr(last_performed, 6, 2) || '.' || "
+                    "substr(last_performed, 1, 4) "
+                    "ELSE last_performed END "
+                    "FROM songs WHERE id IN (SELECT value FROM json_each(:ids))",
+                    params)
+                cur.execute(
+                    "INSERT INTO change_log(entity, id_entity, op) "
+                    "SELECT 'song', value, 'insert' FROM json_each(:ids)",
+                    params)
+                cur.execute("DELETE FROM bulk_insert_mode")
+        except DatabaseError as err:
+            self._conn.rollback()  # don't leave the shared connection in a transaction.
+            raise DatabaseError("insert_songs_bulk", err)
+        except Exception:
+            # e.g. a bad song: the transaction was begun here, end it anyway.
+            self._conn.rollback()
+            raise
+        else:
+            self._conn.commit()  # complete ALL inserts at once.
+        finally:
+            cur.close()
+        return SongChanges(inserted=ids_songs), rejected
+
+    def delete_categories_from_db(self, categories: list[str]) -> SongChanges:
+        """
+        Delete categories from the DB
+        (their songs are deleted by ON DELETE CASCADE).
+        """
+        # one parameter for any number of categories.
+        params: dict = {"categories": json.dumps(list(categories))}
+        cur = self._conn.cursor()
+        try:
+            cur.execute(
+                "SELECT songs.id FROM songs WHERE songs.id_category IN "
+                "(SELECT id FROM categories WHERE category IN "
+                "(SELECT value FROM json_each(:categories)))",
+                params)
+            ids_songs: set[int] = {id_song for id_song, in cur.fetchall()}
+            cur.execute(
+                "DELETE FROM categories WHERE category IN "
+                "(SELECT value FROM json_each(:categories))",
+                params)
         except DatabaseError as err:
+            self._conn.rollback()  # don't leave the shared connection in a transaction.
             raise DatabaseError("delete_categories_from_db", err)
         else:
-            conn.commit()  # complete transaction.
+            self._conn.commit()  # complete transaction.
+            self._invalidate_taxonomy()
+            self.clear_text_cache(ids_songs)  # ids of deleted songs may be reused.
         finally:
             cur.close()
-            conn.close()
+        return SongChanges(deleted=ids_songs)
 
-    def delete_genres_from_db(self, genres: list[str]) -> None:
-        """ Delete genres from the DB. """
-        conn = connect(self._path_to_db + "songbook.db")
-        conn.execute("PRAGMA foreign_keys=1")  # enable cascade deleting and updating.
-        cur = conn.cursor()
+    def delete_genres_from_db(self, genres: list[str]) -> SongChanges:
+        """
+        Delete genres from the DB
+        (the songs lose them by ON DELETE CASCADE of songs_genres).
+        """
+        # one parameter for any number of genres.
+        params: dict = {"genres": json.dumps(list(genres))}
+        cur = self._conn.cursor()
         try:
-            for genre in genres:
-                cur.execute("DELETE FROM genres WHERE genre=:genre",
-                            {"genre": genre})
+            cur.execute(
+                "SELECT DISTINCT id_song FROM songs_genres WHERE id_genre IN "
+                "(SELECT id FROM genres WHERE genre IN "
+                "(SELECT value FROM json_each(:genres)))",
+                params)
+            ids_songs: set[int] = {id_song for id_song, in cur.fetchall()}
+            cur.execute(
+                "DELETE FROM genres WHERE genre IN "
+                "(SELECT value FROM json_each(:genres))",
+                params)
         except DatabaseError as err:
+            self._conn.rollback()  # don't leave the shared connection in a transaction.
             raise DatabaseError("delete_genres_from_db", err)
         else:
-            conn.commit()  # complete transaction.
+            self._conn.commit()  # complete transaction.
+            self._invalidate_taxonomy()
         finally:
             cur.close()
-            conn.close()
+        return SongChanges(updated=ids_songs)
+
+    def delete_songs_from_db(self, titles: list[str]) -> SongChanges:
+        """ Delete songs from the DB by their titles (see delete_songs_by_ids). """
+        return self.delete_songs_by_ids(self.resolve_ids(titles).values())
 
-    def delete_songs_from_db(self, titles: list[str]) -> None:
-        """ Delete songs from the DB. """
-        conn = connect(self._path_to_db + "songbook.db")
-        conn.execute("PRAGMA foreign_keys=1")  # enable cascade deleting and updating.
-        cur = conn.cursor()
+    def delete_songs_by_ids(self, ids_songs) -> SongChanges:
+        """
+        Delete songs from the DB by ONE request for all ids
+        (their links to genres are deleted by ON DELETE CASCADE).
+        """
+        cur = self._conn.cursor()
         try:
-            for title in titles:
-                cur.execute("DELETE FROM songs WHERE title=:title",
-                            {"title": title})
+            # one parameter for any number of ids.
+            cur.execute(
+                "DELETE FROM songs WHERE id IN "
+                "(SELECT value FROM json_each(:ids)) RETURNING id",
+                {"ids": json.dumps(list(ids_songs))})
+            ids_deleted: set[int] = {id_song for id_song, in cur.fetchall()}
         except DatabaseError as err:
-            raise DatabaseError("delete_songs_from_db", err)
+            self._conn.rollback()  # don't leave the shared connection in a transaction.
+            raise DatabaseError("delete_songs_by_ids", err)
         else:
-            conn.commit()  # complete transaction.
+            self._conn.commit()  # complete transaction.
+            self.clear_text_cache(ids_deleted)  # ids of deleted songs may be reused.
         finally:
             cur.close()
-            conn.close()
+        return SongChanges(deleted=ids_deleted)
 
-    def update_genres(self, current_genre: str, new_genre: str) -> None:
+    def update_genres(self, current_genre: str, new_genre: str) -> SongChanges:
         """ Update genres in DB. """
-        conn = connect(self._path_to_db + "songbook.db")
-        conn.execute("PRAGMA foreign_keys=1")  # enable cascade deleting and updating.
-        cur = conn.cursor()
+        cur = self._conn.cursor()
         try:
+            # the songs of the genre are changed too.
+            cur.execute(
+                "SELECT songs_genres.id_song FROM songs_genres "
+                "JOIN genres ON genres.id=songs_genres.id_genre "
+                "WHERE genres.genre=:current_genre",
+                {"current_genre": current_genre})
+            ids_songs: set[int] = {id_song for id_song, in cur.fetchall()}
             cur.execute(
                 "UPDATE genres "
-                "SET genre=:new_genre "
+                "SET genre=:new_genre, "
+                # the key is written only with a new name (see update_song_by_id).
+                "genre_key=CASE WHEN genre=:new_genre COLLATE BINARY "
+                "THEN genre_key ELSE :new_genre_key END "
                 "WHERE genre=:current_genre",
                 {
                     "new_genre": new_genre,
+                    "new_genre_key": title_key(new_genre),
                     "current_genre": current_genre,
                 }
             )
         except DatabaseError as err:
+            self._conn.rollback()  # don't leave the shared connection in a transaction.
             raise DatabaseError("update_genres", err)
         else:
-            conn.commit()  # complete transaction
+            self._conn.commit()  # complete transaction
+            self._invalidate_taxonomy()
         finally:
             cur.close()
-            conn.close()
+        return SongChanges(updated=ids_songs)
 
-    def update_categories(self, current_category: str, new_category: str) -> None:
+    def update_categories(self, current_category: str, new_category: str) -> SongChanges:
         """ Update categories in DB. """
-        conn = connect(self._path_to_db + "songbook.db")
-        conn.execute("PRAGMA foreign_keys=1")  # enable cascade deleting and updating.
-        cur = conn.cursor()
+        cur = self._conn.cursor()
         try:
+            # the songs of the category are changed too.
+            cur.execute(
+                "SELECT songs.id FROM songs "
+                "JOIN categories ON categories.id=songs.id_category "
+                "WHERE categories.category=:current_category",
+                {"current_category": current_category})
+            ids_songs: set[int] = {id_song for id_song, in cur.fetchall()}
             cur.execute(
                 "UPDATE categories "
-                "SET category=:new_category "
+                "SET category=:new_category, "
+                # the key is written only with a new name (see update_song_by_id).
+                "category_key=CASE WHEN category=:new_category COLLATE BINARY "
+                "THEN category_key ELSE :new_category_key END "
                 "WHERE category=:current_category",
                 {
                     "new_category": new_category,
+                    "new_category_key": title_key(new_category),
                     "current_category": current_category,
                 }
             )
         except DatabaseError as err:
+            self._conn.rollback()  # don't leave the shared connection in a transaction.
             raise DatabaseError("update_categories", err)
         else:
-            conn.commit()  # complete transaction
+            self._conn.commit()  # complete transaction
+            self._invalidate_taxonomy()
         finally:
             cur.close()
-            conn.close()
+        return SongChanges(updated=ids_songs)
 
-    def update_song(self, current_title: str, new_song: dict) -> None:
-        """ Update song in DB. """
-        conn = connect(self._path_to_db + "songbook.db")
-        conn.execute("PRAGMA foreign_keys=1")  # enable cascade deleting and updating.
-        cur = conn.cursor()
+    def update_song(self, current_title: str, new_song: Song) -> SongChanges:
+        """ Update song in DB by its current title (see update_song_by_id). """
+        id_song: int | None = self.resolve_ids([current_title]).get(current_title)
+        if id_song is None:
+            raise DatabaseError("update_song", f"no song '{current_title}'")
+        return self.update_song_by_id(id_song, new_song)
 
-        id_category: int = self._get_id_category(new_song["category"])
-        id_song: int = self._get_id_song(current_title)
+    def update_song_by_id(self, id_song: int, new_song: Song) -> SongChanges:
+        """
+        Update the song with id_song in DB: only the changed columns
+        and the added or removed genres. If nothing is changed, DB isn't
+        written at all (empty SongChanges are returned).
+        """
+        cur = self._conn.cursor()
+
+        id_category: int = self._get_id_category(new_song.category)
+        ids_genres: list[int] = list(dict.fromkeys(
+            self._get_ids_genres(new_song.genres)))
+        new_values: dict[str, object] = {
+            "title": new_song.title,
+            "title_key": title_key(new_song.title),
+            "id_category": id_category,
+            "song_image": new_song.song_image,
+            "song_text": new_song.song_text,
+            "last_performed": new_song.last_performed,
+            "is_recently": new_song.is_recently,
+            "comment": new_song.comment,
+        }
         try:
-            # Update songs
+            # the stored record to compare with.
             cur.execute(
-                "UPDATE songs "
-                "SET "
-                  "title=:new_title, "
-                  "id_category=:id_category, "
-                  "song_image=:song_image, "
-                  "song_text=:song_text, "
-                  "last_performed=:last_performed, "
-                  "is_recently=:is_recently, "
-                  "comment=:comment "
-                "WHERE title=:current_title",
-                {
-                    "new_title": new_song["title"],
-                    "current_title": current_title,
-                    "id_category": id_category,
-                    "song_image": new_song["song_image"],
-                    "song_text": new_song["song_text"],
-                    "last_performed": new_song["last_performed"],
-                    "is_recently": new_song["is_recently"],
-                    "comment": new_song["comment"],
-                }
-            )
-            # Delete from songs_genres the current song with old genres.
-            cur.execute("DELETE FROM songs_genres WHERE id_song=:id_song",
+                f"SELECT {', '.join(_SONG_COLUMNS)} FROM songs WHERE id=:id_song",
+                {"id_song": id_song})
+            row: tuple | None = cur.fetchone()
+            if row is None:
+                raise DatabaseError(f"no song with id {id_song}")
+            cur.execute("SELECT id_genre FROM songs_genres WHERE id_song=:id_song",
                         {"id_song": id_song})
+            current_ids_genres: set[int] = {id_genre for id_genre, in cur.fetchall()}
 
-            # Update songs_genres
-            ids_genres: list = self._get_ids_genres(new_song["genres"])
-            # insert the current song with updated genres. 
-            for id_genre in ids_genres:
+            stored: dict[str, object] = dict(zip(_SONG_COLUMNS, row))
+            # the key is written only with a new title: the stored one may be
+            # a unique key of an older duplicate (see migration 7).
+            if new_values["title"] == stored["title"]:
+                new_values["title_key"] = stored["title_key"]
+            changed: list[str] = [
+                column for column in _SONG_COLUMNS
+                if new_values[column] != stored[column]]
+            added: list[int] = [id_genre for id_genre in ids_genres
+                                if id_genre not in current_ids_genres]
+            removed: list[int] = list(current_ids_genres.difference(ids_genres))
+            if not (changed or added or removed):  # nothing to save.
+                return SongChanges()
+
+            # only the changed columns (so the FTS and trigram triggers
+            # fire only if their columns are changed).
+            if changed:
                 cur.execute(
-                    "INSERT INTO songs_genres(id_song, id_genre) "
-                    "VALUES(:id_song, :id_genre)",
-                    {"id_song": id_song, "id_genre": id_genre}
+                    "UPDATE songs SET "
+                    + ", ".join(f"{column}=:{column}" for column in changed)
+                    + " WHERE id=:id_song",
+                    {column: new_values[column] for column in changed}
+                    | {"id_song": id_song}
                 )
+            if removed:
+                cur.execute(
+                    "DELETE FROM songs_genres WHERE id_song=:id_song "
+                    "AND id_genre IN (SELECT value FROM json_each(:ids_genres))",
+                    {"id_song": id_song, "ids_genres": json.dumps(removed)})
+            cur.executemany(
+                "INSERT INTO songs_genres(id_song, id_genre) VALUES(?, ?)",
+                ((id_song, id_genre) for id_genre in added)
+            )
         except DatabaseError as err:
-            raise DatabaseError("update_song", err)
+            self._conn.rollback()  # don't leave the shared connection in a transaction.
+            raise DatabaseError("update_song_by_id", err)
         else:
-            conn.commit()  # complete ALL transactions!
+            self._conn.commit()  # complete ALL transactions!
+            if "song_text" in changed:
+                self._text_cache.pop(id_song, None)
         finally:
             cur.close()
-            conn.close()
+        return SongChanges(updated=(id_song,))
 
-    def delete_multi_records(self, titles_list: list[str]) -> None:
+    def delete_multi_records(self, titles_list: list[str]) -> SongChanges:
         """
         Delete songs with all dependences in songs_genres from the database.
         """
-        # Get ids all deleting songs by their titles.
-        ids_songs: list = self._get_ids_songs(titles_list)
-        conn = connect(self._path_to_db + "songbook.db")
-        conn.execute("PRAGMA foreign_keys=1")  # enable cascade deleting and updating.
-        cur = conn.cursor()
-        try:
-            for id_song in ids_songs:  # Deleting from songs_genres table.
-                cur.execute("DELETE FROM songs_genres WHERE id_song=:id_song",
-                            {"id_song": id_song})
-            for id in ids_songs:  # Deleting from songs table.
-                cur.execute("DELETE FROM songs WHERE id=:id", {"id": id})
-        except DatabaseError as err:
-            raise DatabaseError("delete_multi_records:", err)
-        else:
-            conn.commit()  # commit transactions after completion all deletings.
-        finally:
-            cur.close()
-            conn.close()
+        # songs_genres are deleted by ON DELETE CASCADE, so it's the same
+        # set-based deleting (the ids are not got title by title any more).
+        return self.delete_songs_from_db(titles_list)
 
 #     # def funDeleteSeveralPhonesFromRecord(self, name, phonesList):
 #     #     """ Delete several phones from the record. """
@@ -506,84 +1238,108 @@ class Songbook:
 #     #         cur.close()
 #     #         conn.close()
 
-    def clear_db(self):
+    def clear_db(self) -> SongChanges:
         """ Delete all data from the database. """
-        conn = connect(self._path_to_db + "songbook.db")
-        conn.execute("PRAGMA foreign_keys=1")  # enable cascade deleting and updating.
-        cur = conn.cursor()
+        cur = self._conn.cursor()
         sql = """\
         DELETE FROM categories;
         DELETE FROM genres;
         """
         try:
+            cur.execute("SELECT id FROM songs")
+            ids_songs: set[int] = {id_song for id_song, in cur.fetchall()}
             cur.executescript(sql)
         except DatabaseError as err:
+            self._conn.rollback()  # don't leave the shared connection in a transaction.
             raise DatabaseError("clear_db", err)
         else:
-            conn.commit()  # complete transaction.
+            self._conn.commit()  # complete transaction.
+            self.clear_text_cache()  # ids of deleted songs may be reused.
+            self._invalidate_taxonomy()
         finally:
             cur.close()
-            conn.close()
+        return SongChanges(deleted=ids_songs)
 
-    def _get_id_category(self, category: str) -> int:
-        """ Get id_category by its UNIQUE category. """
-        conn = connect(self._path_to_db + "songbook.db")
-        conn.execute("PRAGMA foreign_keys=1")  # enable cascade deleting and updating.
-        cur = conn.cursor()
+    def _add_names(self, table: str, column: str, names) -> tuple[list[str], list[str]]:
+        """
+        Insert names into the UNIQUE column of the table (genres or
+        categories) by ONE request, the existing names are skipped.
+        Names are compared by their keys (title_key, see the migration 9).
+        Returns (the inserted names, the existing ones).
+        """
+        # a name repeated in a different case is added once.
+        unique: dict[str, str] = {}
+        for name in names:
+            unique.setdefault(title_key(name), name)
+        inserted: set[str] = set()
+        cur = self._conn.cursor()
         try:
-            cur.execute("SELECT id FROM categories WHERE category=:category",
-                        {"category": category})
+            if unique:
+                # RETURNING gives the inserted names (executemany() can't
+                # return rows), the names which are already in DB are
+                # ignored by the UNIQUE index of the key.
+                cur.execute(
+                    f"INSERT OR IGNORE INTO {table}({column}, {column}_key) "
+                    f"SELECT value, title_key(value) FROM json_each(:names) "
+                    f"RETURNING {column}",
+                    {"names": json.dumps(list(unique.values()))})
+                inserted = {name for name, in cur.fetchall()}
         except DatabaseError as err:
-            raise DatabaseError("_get_id_category:", err)
+            self._conn.rollback()  # don't leave the shared connection in a transaction.
+            raise DatabaseError(f"add_{table}", err)
+        except Exception:
+            # don't leave the shared connection in a transaction either.
+            self._conn.rollback()
+            raise
         else:
-            # get id_category from the list[0]
-            id_category: int = cur.fetchone()[0]
+            self._conn.commit()  # complete transaction
+            if inserted:
+                self._invalidate_taxonomy()
         finally:
             cur.close()
-            conn.close()
+        added: list[str] = [name for name in unique.values() if name in inserted]
+        existing: list[str] = [name for name in unique.values() if name not in inserted]
+        return added, existing
+
+    def _get_name_ids(self) -> tuple[_NameIds, _NameIds]:
+        """
+        Get the cached ids of genres and categories, load them
+        if they're changed since the last load.
+        """
+        version: tuple[int, int] = (self.data_version(),
+                                    Songbook._taxonomy_generation)
+        if self._taxonomy_version != version:
+            cur = self._conn.cursor()
+            try:
+                cur.execute("SELECT id, genre, genre_key FROM genres")
+                self._genres = _NameIds(cur.fetchall())
+                cur.execute("SELECT id, category, category_key FROM categories")
+                self._categories = _NameIds(cur.fetchall())
+            except DatabaseError as err:
+                raise DatabaseError("_get_name_ids", err)
+            finally:
+                cur.close()
+            self._taxonomy_version = version
+        return self._genres, self._categories
 
+    def _invalidate_taxonomy(self) -> None:
+        """ Make all INSTANCES load the ids of genres and categories again. """
+        Songbook._taxonomy_generation += 1
+
+    def _get_id_category(self, category: str) -> int:
+        """ Get id_category by its UNIQUE category. """
+        id_category: int | None = self._get_name_ids()[1].get_id(category)
+        if id_category is None:
+            raise DatabaseError("_get_id_category", f"no category '{category}'")
         return id_category
 
     def _get_ids_genres(self, genres: list[str]) -> list[int]:
         """ Get genres ids by their UNIQUE genre. """
-        ids_genres: list = []
-        conn = connect(self._path_to_db + "songbook.db")
-        conn.execute("PRAGMA foreign_keys=1")  # enable cascade deleting and updating.
-        cur = conn.cursor()
-        try:
-            for genre in genres:
-                cur.execute("SELECT id FROM genres WHERE genre=:genre", {"genre": genre})
-                ids_genres.append(cur.fetchone()[0])
-        except DatabaseError as err:
-            raise DatabaseError("_get_ids_genres", err)
-        finally:
-            cur.close()
-            conn.close()
-
+        name_ids: _NameIds = self._get_name_ids()[0]
+        ids_genres: list[int] = []
+        for genre in genres:
+            id_genre: int | None = name_ids.get_id(genre)
+            if id_genre is None:
+                raise DatabaseError("_get_ids_genres", f"no genre '{genre}'")
+            ids_genres.append(id_genre)
         return ids_genres
-
-    def _get_id_song(self, title: str) -> int:
-        """ Get id_song by its UNIQUE title. """
-        conn = connect(self._path_to_db + "songbook.db")
-        conn.execute("PRAGMA foreign_keys=1")  # enable cascade deleting and updating.
-        cur = conn.cursor()
-        try:
-            cur.execute("SELECT id FROM songs WHERE title=:title", {"title": title})
-        except DatabaseError as err:
-            raise DatabaseError("_get_id_song:", err)
-        else:
-            # get id_song from the list[0]
-            id_song: int = cur.fetchone()[0]
-        finally:
-            cur.close()
-            conn.close()
-
-        return id_song
-
-    def _get_ids_songs(self, titles_list: list[str]) -> list[int]:
-        """ Get ids_songs by its UNIQUE title. """
-        ids_songs: list = []
-        for title in titles_list:
-            ids_songs.append(self._get_id_song(title))
-
-        return ids_songs
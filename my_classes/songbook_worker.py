@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+""" Module contains classes SongbookTask and SongbookWorker. """
+# Songbook requests used to run in the GUI thread, so a long load of all
+# songs or a cascade deleting of a category froze the window.
+# SongbookWorker runs them in its own thread with its own Songbook (the
+# ConnectionPool gives every thread its own connection). Every request
+# returns SongbookTask: connect its signals and start() it. The signals
+# are emitted in the worker thread and delivered to the GUI slots by Qt
+# (queued connections), so the slots may touch the widgets.
+# A task can be cancelled: a not started one is not run, a running one
+# is stopped at the next batch or its SQL statement is interrupted.
+
+import threading
+from collections.abc import Callable
+from concurrent.futures import (
+    Future,
+    ThreadPoolExecutor,
+)
+from sqlite3 import DatabaseError
+
+from PySide6.QtCore import (
+    QObject,
+    Signal,
+)
+
+from my_classes.songbook import Songbook
+
+# How many songs load_songs() sends in one batch_loaded signal.
+LOAD_BATCH_SIZE: int = 500
+
+
+class SongbookTask(QObject):
+    """
+    Class SongbookTask: one request to SongbookWorker.
+    It's run by start(), connect its signals before (a quick request may
+    be done before the next line of the caller).
+    """
+    # the next songs of a streamed load.
+    batch_loaded = Signal(list)
+    # (done, total).
+    progress = Signal(int, int)
+    # the result of the request.
+    finished = Signal(object)
+    # the error message.
+    failed = Signal(str)
+    cancelled = Signal()
+
+    def __init__(self, worker: "SongbookWorker",
+                 function: Callable[[Songbook, "SongbookTask"], object]):
+        super().__init__()
+        self._worker: SongbookWorker = worker
+        # function(songbook, task) to run in the worker thread.
+        self._function: Callable[[Songbook, SongbookTask], object] = function
+        self._cancel_event: threading.Event = threading.Event()
+        self.future: Future | None = None
+
+    def start(self) -> "SongbookTask":
+        """ Put the request in the queue of the worker thread. """
+        self.future = self._worker._submit(self)
+        return self
+
+    def cancel(self) -> None:
+        """
+        Cancel the request: it's not run if it's not started yet,
+        otherwise it's stopped at the next batch and its running SQL
+        statement is interrupted (a change of DB is rolled back).
+        """
+        self._cancel_event.set()
+        if self.future is not None and not self.future.cancel():
+            self._worker.interrupt(self)
+
+    def is_cancelled(self) -> bool:
+        """ Check if cancel() was called. """
+        return self._cancel_event.is_set()
+
+
+class SongbookWorker:
+    """
+    Class SongbookWorker to run Songbook requests in one background thread
+    (one after another, in the order they're made).
+    """
+
+    def __init__(self, path_to_db_file: str | None = None):
+        self._path_to_db_file: str | None = path_to_db_file
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="songbook_worker")
+        # created and used only in the worker thread.
+        self._songbook: Songbook | None = None
+        # the tasks which are not done yet and the running one.
+        self._lock: threading.Lock = threading.Lock()
+        self._tasks: set[SongbookTask] = set()
+        self._running: SongbookTask | None = None
+
+    def _get_songbook(self) -> Songbook:
+        """ Get Songbook of the worker thread. """
+        if self._songbook is None:
+            self._songbook = Songbook(path_to_db_file=self._path_to_db_file)
+        return self._songbook
+
+    def _submit(self, task: SongbookTask) -> Future:
+        """ Run the function of the task in the worker thread. """
+
+        def run() -> None:
+            with self._lock:
+                self._running = task
+            try:
+                if task.is_cancelled():
+                    task.cancelled.emit()
+                    return
+                result = task._function(self._get_songbook(), task)
+            except DatabaseError as err:
+                if task.is_cancelled():  # interrupted.
+                    task.cancelled.emit()
+                else:
+                    task.failed.emit(str(err))
+            except Exception as err:
+                # any other error must end the task too (the future would
+                # keep it silently, so the GUI would wait for it forever).
+                task.failed.emit(f"{type(err).__name__}: {err}")
+            else:
+                if task.is_cancelled() and result is None:
+                    task.cancelled.emit()
+                else:
+                    task.finished.emit(result)
+            finally:
+                with self._lock:
+                    self._running = None
+
+        def forget(future: Future) -> None:
+            with self._lock:
+                self._tasks.discard(task)
+
+        with self._lock:
+            self._tasks.add(task)
+        future: Future = self._executor.submit(run)
+        # it's done (or it's cancelled before it's run).
+        future.add_done_callback(forget)
+        return future
+
+    def call(self, method: str, *args) -> SongbookTask:
+        """
+        Get the task to call Songbook.method(*args) in the worker thread,
+        its result is sent by the finished signal.
+        """
+        return SongbookTask(
+            self, lambda songbook, task: getattr(songbook, method)(*args))
+
+    def load_songs(self, batch_size: int = LOAD_BATCH_SIZE) -> SongbookTask:
+        """
+        Get the task to load all songs (without texts) ordered by title like
+        Songbook.get_songs() does, but by batches: batch_loaded(list[Song])
+        and progress(done, total) are sent after every batch.
+        finished sends the change seq got before the load
+        (see Songbook.changes_since), it's None if the load is cancelled.
+        """
+        def load(songbook: Songbook, task: SongbookTask) -> int | None:
+            change_seq: int = songbook.get_change_seq()
+            total: int = songbook.get_songs_count()
+            done: int = 0
+            batches = songbook.iter_songs(batch_size)
+            try:
+                for songs in batches:
+                    done += len(songs)
+                    task.batch_loaded.emit(songs)
+                    task.progress.emit(done, total)
+                    if task.is_cancelled():
+                        break
+            finally:
+                batches.close()  # close the cursor if it's cancelled.
+            if task.is_cancelled():
+                return None
+            # all songs are loaded, the older changes are not needed.
+            songbook.prune_change_log()
+            return change_seq
+
+        return SongbookTask(self, load)
+
+    def interrupt(self, task: SongbookTask) -> None:
+        """ Interrupt the SQL statement of the task if it's running now. """
+        with self._lock:
+            if self._running is task and self._songbook is not None:
+                self._songbook.interrupt()
+
+    def close(self) -> None:
+        """
+        Cancel all tasks, close the connection of the worker thread
+        and wait for the thread to finish.
+        """
+        with self._lock:
+            tasks: list[SongbookTask] = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+
+        def close_songbook() -> None:
+            if self._songbook is not None:
+                self._songbook.close()
+                self._songbook = None
+
+        self._executor.submit(close_songbook)
+        self._executor.shutdown(wait=True)